@@ -5,6 +5,7 @@ sql/data/ 直下実行版、MySQLコネクション状態管理修正済み
 """
 
 import mysql.connector
+import argparse
 import time
 import os
 
@@ -17,6 +18,13 @@ DB_CONFIG = {
     "charset": "utf8mb4",
 }
 
+# 管理系操作（FLUSH TABLES ... FOR EXPORT、グローバル変数変更など）用
+ROOT_DB_CONFIG = {
+    **DB_CONFIG,
+    "user": "root",
+    "password": "rootpassword",
+}
+
 # SQLクエリ定義（範囲系特化 + 新パターン）
 QUERIES = {
     "date_range_massive": {
@@ -102,6 +110,32 @@ QUERIES = {
     },
 }
 
+# 範囲系に特化したインデックス (テーブル, インデックス名, カラム)
+OPTIMAL_INDEXES = [
+    ("orders", "idx_shipping_country", "shipping_country"),
+    ("orders", "idx_order_date", "order_date"),
+    ("orders", "idx_total_amount", "total_amount"),
+    ("orders", "idx_status", "status"),
+    # 複合インデックス（範囲 + ソート最適化）
+    ("orders", "idx_date_amount", "order_date, total_amount"),
+    ("orders", "idx_amount_date", "total_amount, order_date"),
+    ("orders", "idx_country_date", "shipping_country, order_date"),
+    ("orders", "idx_status_amount", "status, total_amount"),
+    # カバリングインデックス（範囲検索用）
+    (
+        "orders",
+        "idx_covering_range",
+        "order_date, total_amount, shipping_country, status",
+    ),
+]
+
+# インデックス作成時のDDL並列度（MySQL 8.4 のセッション変数）
+DDL_SETTINGS = {
+    "innodb_ddl_threads": 4,
+    "innodb_ddl_buffer_size": 64 * 1024 * 1024,
+    "innodb_parallel_read_threads": 4,
+}
+
 
 def clear_cursor_safely(cursor):
     """カーソル状態を安全にクリア"""
@@ -177,29 +211,25 @@ def drop_all_indexes(cursor):
         print(f"    💥 インデックス削除処理エラー: {e}")
 
 
+def apply_ddl_settings(cursor, settings=None):
+    """インデックス作成用のDDL並列度をセッションに設定"""
+    for name, value in (settings or DDL_SETTINGS).items():
+        clear_cursor_safely(cursor)
+        cursor.execute(f"SET SESSION {name} = {value}")
+        clear_cursor_safely(cursor)
+
+
 def create_optimal_indexes(cursor):
     """範囲系に特化したインデックス"""
     print("⚡ 範囲系特化インデックス作成開始...")
 
-    indexes = [
-        ("orders", "idx_shipping_country", "shipping_country"),
-        ("orders", "idx_order_date", "order_date"),
-        ("orders", "idx_total_amount", "total_amount"),
-        ("orders", "idx_status", "status"),
-        # 複合インデックス（範囲 + ソート最適化）
-        ("orders", "idx_date_amount", "order_date, total_amount"),
-        ("orders", "idx_amount_date", "total_amount, order_date"),
-        ("orders", "idx_country_date", "shipping_country, order_date"),
-        ("orders", "idx_status_amount", "status, total_amount"),
-        # カバリングインデックス（範囲検索用）
-        (
-            "orders",
-            "idx_covering_range",
-            "order_date, total_amount, shipping_country, status",
-        ),
-    ]
-
-    for table, index_name, columns in indexes:
+    try:
+        apply_ddl_settings(cursor)
+    except Exception as e:
+        clear_cursor_safely(cursor)
+        print(f"    ⚠️ DDL並列設定失敗（サーバーデフォルトで続行）: {e}")
+
+    for table, index_name, columns in OPTIMAL_INDEXES:
         try:
             clear_cursor_safely(cursor)
             create_sql = f"CREATE INDEX {index_name} ON {table}({columns})"
@@ -280,12 +310,42 @@ def run_query_with_timer(cursor, sql):
         }
 
 
+def show_cache_status(result):
+    """プランキャッシュの利用状況とプランフリップを表示"""
+    from plan_cache import show_plan_flip
+
+    labels = {
+        "hit": "♻️ キャッシュ再利用（スキーマ・統計情報に変化なし）",
+        "retimed": "⏱️ プラン不変のため通常実行のみで再計測",
+        "miss": "🆕 EXPLAIN ANALYZE 実行",
+    }
+    print(f"   {labels[result['cache']]}")
+    if result.get("plan_flip"):
+        show_plan_flip(result["plan_flip"])
+
+
 def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE統合ベンチマーク")
+    parser.add_argument(
+        "--plan-cache",
+        action="store_true",
+        help="プランが変わっていなければ EXPLAIN ANALYZE 結果を再利用する",
+    )
+    args = parser.parse_args()
+
     print("🔥 EXPLAIN ANALYZE統合ベンチマーク (sql/data/ 版)")
     print("=" * 60)
 
     conn = None
     cursor = None
+    plan_cache = None
+    run = run_query_with_timer
+
+    if args.plan_cache:
+        from plan_cache import PlanCache
+
+        plan_cache = PlanCache()
+        run = plan_cache.run
 
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
@@ -308,10 +368,12 @@ def main():
             print("\n❌ インデックス削除後:")
             show_current_indexes(cursor)
 
-            result1 = run_query_with_timer(cursor, sql)
+            result1 = run(cursor, sql)
             if not result1["execution_time"]:
                 print(f"   ⚠️ クエリ実行失敗: {result1['explain_output']}")
                 continue
+            if plan_cache:
+                show_cache_status(result1)
 
             print(f"❌ インデックスなし:")
             print(f"   実行時間: {result1['execution_time']:.3f}秒")
@@ -328,10 +390,12 @@ def main():
             print("\n✅ インデックス作成後:")
             show_current_indexes(cursor)
 
-            result2 = run_query_with_timer(cursor, sql)
+            result2 = run(cursor, sql)
             if not result2["execution_time"]:
                 print(f"   ⚠️ クエリ実行失敗: {result2['explain_output']}")
                 continue
+            if plan_cache:
+                show_cache_status(result2)
 
             print(f"✅ インデックスあり:")
             print(f"   実行時間: {result2['execution_time']:.3f}秒")
@@ -389,6 +453,11 @@ def main():
 
         traceback.print_exc()
     finally:
+        if plan_cache:
+            plan_cache.save()
+            plan_cache.close()
+            if plan_cache.flips:
+                print(f"\n🔀 プランフリップ: {len(plan_cache.flips)}件")
         # 接続のクリーンアップ
         if cursor:
             try:
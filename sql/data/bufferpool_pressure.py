@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+メモリ逼迫モード - バッファプールをワーキングセットより小さくしてベンチマーク
+innodb_buffer_pool_size をオンラインで縮小し、QUERIES のレイテンシと
+Innodb_buffer_pool_reads の変化を計測した後、元のサイズに戻す
+"""
+
+import argparse
+import math
+import statistics
+import time
+
+import mysql.connector
+
+from benchmark import (
+    QUERIES,
+    ROOT_DB_CONFIG,
+    clear_cursor_safely,
+    create_optimal_indexes,
+    drop_all_indexes,
+)
+
+# ワーキングセットに対するバッファプールの割合（大きい順に実行）
+DEFAULT_FRACTIONS = [1.5, 1.0, 0.5, 0.25, 0.1]
+
+RESIZE_POLL_INTERVAL = 0.5
+RESIZE_TIMEOUT = 300
+# Innodb_buffer_pool_resize_status_code の「リサイズ失敗」
+RESIZE_FAILED = 7
+
+
+def fetch_global(cursor, name):
+    """グローバル変数の値を取得"""
+    clear_cursor_safely(cursor)
+    cursor.execute(f"SELECT @@GLOBAL.{name}")
+    value = cursor.fetchone()[0]
+    clear_cursor_safely(cursor)
+    return int(value)
+
+
+def fetch_status(cursor, name):
+    """グローバルステータスの値を取得（存在しなければ None）"""
+    clear_cursor_safely(cursor)
+    cursor.execute("SHOW GLOBAL STATUS LIKE %s", (name,))
+    row = cursor.fetchone()
+    clear_cursor_safely(cursor)
+    return row[1] if row else None
+
+
+def measure_working_set(cursor, table="orders"):
+    """テーブルのデータ + インデックスサイズ（バイト）"""
+    clear_cursor_safely(cursor)
+    # information_schema.TABLES のキャッシュを使わず最新値を読む
+    cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    cursor.execute(
+        """
+        SELECT DATA_LENGTH, INDEX_LENGTH
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    data_length, index_length = cursor.fetchone()
+    clear_cursor_safely(cursor)
+    return int(data_length), int(index_length)
+
+
+def resize_step(cursor):
+    """オンラインリサイズの刻み（chunk_size × インスタンス数）"""
+    chunk_size = fetch_global(cursor, "innodb_buffer_pool_chunk_size")
+    instances = fetch_global(cursor, "innodb_buffer_pool_instances")
+    return chunk_size, instances, chunk_size * instances
+
+
+def rounded_pool_size(target, step):
+    """MySQL が実際に設定するサイズ（刻みの倍数に切り上げ）"""
+    return max(1, math.ceil(target / step)) * step
+
+
+def actual_pool_size(cursor):
+    """実際に確保されているバッファプールのバイト数（@@innodb_buffer_pool_size は SET 直後に変わる）"""
+    pages = int(fetch_status(cursor, "Innodb_buffer_pool_pages_total"))
+    return pages * fetch_global(cursor, "innodb_page_size")
+
+
+def resize_buffer_pool(cursor, size):
+    """バッファプールをオンラインでリサイズし、実際のページ数が要求サイズになるまで待つ"""
+    size = int(size)
+    if actual_pool_size(cursor) == size:
+        return size
+
+    clear_cursor_safely(cursor)
+    cursor.execute(f"SET GLOBAL innodb_buffer_pool_size = {size}")
+    clear_cursor_safely(cursor)
+
+    deadline = time.time() + RESIZE_TIMEOUT
+    while time.time() < deadline:
+        code = fetch_status(cursor, "Innodb_buffer_pool_resize_status_code")
+        if code is not None and int(code) == RESIZE_FAILED:
+            status = fetch_status(cursor, "Innodb_buffer_pool_resize_status") or ""
+            raise RuntimeError(f"バッファプールのリサイズに失敗しました: {status}")
+        if actual_pool_size(cursor) == size:
+            return size
+        time.sleep(RESIZE_POLL_INTERVAL)
+
+    raise TimeoutError(f"バッファプールのリサイズが {RESIZE_TIMEOUT} 秒で終わりません")
+
+
+def run_query_measured(cursor, sql):
+    """クエリを実行してレイテンシとディスク読み込み回数を返す"""
+    reads_before = int(fetch_status(cursor, "Innodb_buffer_pool_reads"))
+    requests_before = int(fetch_status(cursor, "Innodb_buffer_pool_read_requests"))
+
+    clear_cursor_safely(cursor)
+    start = time.perf_counter()
+    cursor.execute(sql)
+    cursor.fetchall()
+    elapsed = time.perf_counter() - start
+    clear_cursor_safely(cursor)
+
+    reads = int(fetch_status(cursor, "Innodb_buffer_pool_reads")) - reads_before
+    requests = (
+        int(fetch_status(cursor, "Innodb_buffer_pool_read_requests")) - requests_before
+    )
+    return elapsed, reads, requests
+
+
+def run_suite(cursor, repeat):
+    """QUERIES を一巡（ウォームアップ1回 + 計測 repeat 回）"""
+    results = {}
+    for query_key, query_info in QUERIES.items():
+        # 直前の縮小で追い出された状態からの定常状態を見たいので、初回は捨てる
+        run_query_measured(cursor, query_info["sql"])
+
+        runs = [run_query_measured(cursor, query_info["sql"]) for _ in range(repeat)]
+        results[query_key] = {
+            "latency_ms": statistics.median(r[0] for r in runs) * 1000,
+            "reads": statistics.median(r[1] for r in runs),
+            "read_requests": statistics.median(r[2] for r in runs),
+        }
+        result = results[query_key]
+        hit_rate = (
+            (1 - result["reads"] / result["read_requests"]) * 100
+            if result["read_requests"]
+            else 100.0
+        )
+        print(
+            f"   {query_info['name']:24} {result['latency_ms']:10.1f}ms  "
+            f"reads={result['reads']:>10,.0f}  hit={hit_rate:6.2f}%"
+        )
+    return results
+
+
+def show_report(results, pool_sizes):
+    """割合ごとのレイテンシ・ディスク読み込みの変化を表示"""
+    fractions = list(results)
+    baseline = fractions[0]
+
+    print("\n" + "📊" * 30)
+    print("📊 メモリ逼迫レポート（先頭の割合を基準）")
+    print("📊" * 30)
+
+    for query_key, query_info in QUERIES.items():
+        print(f"\n{query_info['name']}:")
+        base = results[baseline][query_key]
+        for fraction in fractions:
+            result = results[fraction][query_key]
+            slowdown = (
+                result["latency_ms"] / base["latency_ms"] if base["latency_ms"] else 0
+            )
+            print(
+                f"   {fraction:5.2f}x ({pool_sizes[fraction] // (1024 * 1024):6,}MB)  "
+                f"{result['latency_ms']:10.1f}ms  ({slowdown:5.1f}倍)  "
+                f"reads={result['reads']:>10,.0f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="バッファプール縮小ベンチマーク")
+    parser.add_argument(
+        "--fractions",
+        type=float,
+        nargs="+",
+        default=DEFAULT_FRACTIONS,
+        help="ワーキングセット（orders のデータ + インデックス）に対する割合",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（中央値を採用）")
+    parser.add_argument(
+        "--indexes",
+        choices=["current", "none", "optimal"],
+        default="current",
+        help="計測前のインデックス状態",
+    )
+    args = parser.parse_args()
+
+    print("🧠 メモリ逼迫モード ベンチマーク")
+    print("=" * 60)
+
+    conn = None
+    cursor = None
+    original_size = None
+
+    try:
+        # innodb_buffer_pool_size の変更には SYSTEM_VARIABLES_ADMIN が必要
+        conn = mysql.connector.connect(**ROOT_DB_CONFIG)
+        cursor = conn.cursor()
+
+        if args.indexes == "none":
+            drop_all_indexes(cursor)
+        elif args.indexes == "optimal":
+            drop_all_indexes(cursor)
+            create_optimal_indexes(cursor)
+        conn.commit()
+
+        original_size = fetch_global(cursor, "innodb_buffer_pool_size")
+        chunk_size, instances, step = resize_step(cursor)
+        data_length, index_length = measure_working_set(cursor)
+        working_set = data_length + index_length
+
+        print(f"📦 元のバッファプール: {original_size // (1024 * 1024):,}MB")
+        print(
+            f"📋 ワーキングセット: {working_set // (1024 * 1024):,}MB "
+            f"(データ {data_length // (1024 * 1024):,}MB + "
+            f"インデックス {index_length // (1024 * 1024):,}MB)"
+        )
+        print(
+            f"⚠️  バッファプールは chunk_size ({chunk_size // (1024 * 1024)}MB) × "
+            f"インスタンス数 ({instances}) = {step // (1024 * 1024)}MB の倍数に切り上げられます"
+        )
+        if step > working_set * min(args.fractions):
+            print(
+                "⚠️  刻みがワーキングセットに対して大きすぎます。"
+                "config/my.cnf の innodb_buffer_pool_chunk_size を下げて再起動してください"
+            )
+
+        results = {}
+        pool_sizes = {}
+        for fraction in sorted(args.fractions, reverse=True):
+            target = int(working_set * fraction)
+            expected = rounded_pool_size(target, step)
+            duplicate = next(
+                (f for f, size in pool_sizes.items() if size == expected), None
+            )
+            if duplicate is not None:
+                print(
+                    f"\n⏭️  {fraction:.2f}x: 目標 {target // (1024 * 1024):,}MB は "
+                    f"{expected // (1024 * 1024):,}MB に丸められ {duplicate:.2f}x と同じになるためスキップ"
+                )
+                continue
+
+            actual = resize_buffer_pool(cursor, expected)
+            pool_sizes[fraction] = actual
+            print(
+                f"\n🔧 {fraction:.2f}x: 目標 {target // (1024 * 1024):,}MB → "
+                f"実際 {actual // (1024 * 1024):,}MB"
+            )
+            results[fraction] = run_suite(cursor, args.repeat)
+
+        show_report(results, pool_sizes)
+
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+    finally:
+        if cursor and original_size:
+            try:
+                restored = resize_buffer_pool(cursor, original_size)
+                print(f"\n🔧 バッファプールを復元: {restored // (1024 * 1024):,}MB")
+            except Exception as e:
+                print(f"\n💥 バッファプール復元失敗（手動で戻してください）: {e}")
+        if cursor:
+            clear_cursor_safely(cursor)
+            cursor.close()
+        if conn:
+            conn.close()
+
+    print("\n🎉 メモリ逼迫モード完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,21 @@
 """
 
 import mysql.connector
+from mysql.connector.conversion import MySQLConverter
+import argparse
+import json
 import random
+import resource
 import string
+import time
+import tracemalloc
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import sys
 import uuid
 
+from distribution_profile import DistributionProfile, age_bucket, position_to_id, profile_path
+
 # 現実的な偏りを持つデータ分布
 FIRST_NAMES = ["Taro", "Hanako", "Yuki", "Akiko", "Hiroshi"] * 20 + [
     "John",
@@ -82,6 +91,211 @@ DB_CONFIG = {
 }
 
 
+class GeneratorMetrics:
+    """テーブルごとのステージ別スループット・メモリ計測"""
+
+    # generate: Python での行生成 / build_sql: SQL文字列の組み立て
+    # convert_params: パラメータのSQLリテラル変換 / send_execute: 送信とサーバー側INSERT
+    # commit: サーバー側コミット
+    PHASES = ("generate", "build_sql", "convert_params", "send_execute", "commit")
+
+    def __init__(self, scale_factor=1.0, trace_memory=False, split_convert=False):
+        self.scale_factor = scale_factor
+        self.trace_memory = trace_memory
+        # True ならパラメータ変換を cursor.execute から切り出して計測する
+        self.split_convert = split_convert
+        self.tables = {}
+        self._current = None
+        self._table_start = None
+        self._bytes_received_start = 0
+
+    def start_table(self, table, conn):
+        self._current = {
+            "rows": 0,
+            "batches": 0,
+            "bytes_sent": 0,
+            "server_bytes_received": 0,
+            "phase_seconds": {phase: 0.0 for phase in self.PHASES},
+        }
+        self.tables[table] = self._current
+        self._bytes_received_start = server_bytes_received(conn)
+        if self.trace_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        self._table_start = time.perf_counter()
+
+    def end_table(self, conn):
+        current = self._current
+        current["elapsed_seconds"] = time.perf_counter() - self._table_start
+        current["rows_per_second"] = (
+            current["rows"] / current["elapsed_seconds"]
+            if current["elapsed_seconds"] > 0
+            else 0.0
+        )
+        current["server_bytes_received"] = (
+            server_bytes_received(conn) - self._bytes_received_start
+        )
+        if self.trace_memory:
+            current["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        # ru_maxrss は Linux では KB 単位。テーブル単位ではなくプロセス開始からの最大値
+        current["process_rss_peak_bytes"] = (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        )
+        self._current = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current["phase_seconds"][name] += time.perf_counter() - start
+
+    def add_batch(self, rows, bytes_sent):
+        self._current["rows"] += rows
+        self._current["batches"] += 1
+        self._current["bytes_sent"] += bytes_sent
+
+    def current_rate(self):
+        elapsed = time.perf_counter() - self._table_start
+        return self._current["rows"] / elapsed if elapsed > 0 else 0.0
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "scale_factor": self.scale_factor,
+                "split_convert": self.split_convert,
+                "tables": self.tables,
+            },
+            indent=2,
+        )
+
+    def to_prometheus(self):
+        metrics = [
+            ("generator_rows_total", "counter", "Rows inserted", "rows"),
+            ("generator_batches_total", "counter", "INSERT batches sent", "batches"),
+            ("generator_bytes_sent_total", "counter", "INSERT statement bytes sent", "bytes_sent"),
+            (
+                "generator_server_bytes_received_total",
+                "counter",
+                "Bytes_received reported by the server session",
+                "server_bytes_received",
+            ),
+            ("generator_elapsed_seconds", "gauge", "Wall time per table", "elapsed_seconds"),
+            ("generator_rows_per_second", "gauge", "Rows inserted per second", "rows_per_second"),
+            (
+                "generator_tracemalloc_peak_bytes",
+                "gauge",
+                "tracemalloc peak while generating the table",
+                "tracemalloc_peak_bytes",
+            ),
+            (
+                "generator_process_rss_peak_bytes",
+                "gauge",
+                "Process lifetime peak RSS when the table finished",
+                "process_rss_peak_bytes",
+            ),
+        ]
+
+        lines = []
+        for metric, kind, help_text, key in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for table, values in self.tables.items():
+                if key in values:
+                    labels = f'table="{table}",scale_factor="{self.scale_factor}"'
+                    lines.append(f"{metric}{{{labels}}} {values[key]}")
+
+        lines.append("# HELP generator_phase_seconds_total Time spent in each phase")
+        lines.append("# TYPE generator_phase_seconds_total counter")
+        for table, values in self.tables.items():
+            for phase, seconds in values["phase_seconds"].items():
+                labels = (
+                    f'table="{table}",phase="{phase}",scale_factor="{self.scale_factor}"'
+                )
+                lines.append(f"generator_phase_seconds_total{{{labels}}} {seconds}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, fmt):
+        content = self.to_prometheus() if fmt == "prometheus" else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        print(f"📈 計測結果を出力: {path} ({fmt})")
+
+    def show_summary(self):
+        print("\n⏱️  ステージ別計測:")
+        for table, values in self.tables.items():
+            phases = values["phase_seconds"]
+            phase_text = ", ".join(f"{p}={phases[p]:.2f}s" for p in self.PHASES)
+            print(
+                f"  📋 {table:10} {values['rows_per_second']:>10,.0f} 行/秒  "
+                f"{values['bytes_sent'] / (1024 * 1024):8.1f}MB  {phase_text}"
+            )
+
+
+def server_bytes_received(conn):
+    """このセッションでサーバーが受信したバイト数"""
+    cursor = conn.cursor()
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_received'")
+    value = int(cursor.fetchone()[1])
+    cursor.close()
+    return value
+
+
+def convert_params(conn, converter, query, params):
+    """
+    パラメータをSQLリテラルに変換して文を組み立てる（--metrics-out 時のみ使う分割経路）
+
+    C拡張の接続では cursor.execute と同じく接続自身の prepare_for_mysql で変換する
+    """
+    if hasattr(conn, "prepare_for_mysql"):
+        values = tuple(conn.prepare_for_mysql(params))
+    else:
+        values = tuple(
+            converter.quote(converter.escape(converter.to_mysql(value)))
+            for value in params
+        )
+    return query.encode("utf-8") % values
+
+
+def executed_bytes(cursor):
+    """
+    直前に送った文のバイト数
+
+    cursor.statement はデコード・strip した文字列のコピーなので、
+    カーソルが保持しているエンコード済みの文（_executed）の長さを使う
+    """
+    executed = getattr(cursor, "_executed", None)
+    if isinstance(executed, (bytes, bytearray)):
+        return len(executed)
+    return len((cursor.statement or "").encode("utf-8"))
+
+
+def execute_batch(conn, cursor, converter, query, params, rows, metrics):
+    """
+    1バッチ分のINSERTをステージごとに計測しながら実行
+
+    通常は cursor.execute(query, params) をそのまま使い、変換時間は send_execute に含まれる。
+    metrics.split_convert のときだけ変換と送信を分けて計測する
+    """
+    if metrics.split_convert:
+        with metrics.phase("convert_params"):
+            statement = convert_params(conn, converter, query, params)
+        with metrics.phase("send_execute"):
+            cursor.execute(statement)
+        bytes_sent = len(statement)
+    else:
+        with metrics.phase("send_execute"):
+            cursor.execute(query, params)
+        bytes_sent = executed_bytes(cursor)
+    with metrics.phase("commit"):
+        conn.commit()
+    metrics.add_batch(rows, bytes_sent)
+
+
 def connect_db():
     """データベースに接続"""
     try:
@@ -239,192 +453,290 @@ def restore_mysql_settings(conn):
     print("🔧 MySQL設定を復元")
 
 
-def bulk_insert_realistic_customers(conn, count=50000):
-    """現実的な分布の顧客データを生成"""
-    print(f"👥 現実的な顧客データ {count:,} 件を生成中...")
+CUSTOMER_COLUMNS = ["email", "first_name", "last_name", "registration_date", "country", "city"]
+ORDER_COLUMNS = [
+    "customer_id",
+    "product_id",
+    "order_date",
+    "quantity",
+    "unit_price",
+    "total_amount",
+    "status",
+    "shipping_country",
+    "shipping_city",
+    "payment_method",
+]
+
+
+def insert_in_batches(conn, table, columns, count, batch_size, make_row, metrics):
+    """make_row() が返す1行分の値を batch_size 件ずつ多値INSERTで投入"""
+    converter = MySQLConverter(DB_CONFIG["charset"])
     cursor = conn.cursor()
+    metrics.start_table(table, conn)
 
-    batch_size = 25000
+    row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
 
     for batch_start in range(0, count, batch_size):
         batch_end = min(batch_start + batch_size, count)
         current_batch_size = batch_end - batch_start
 
-        values_list = []
         params = []
 
-        for i in range(current_batch_size):
-            email = generate_unique_email()
-            first_name = random.choice(FIRST_NAMES)
-            last_name = random.choice(LAST_NAMES)
-            country = random.choice(COUNTRIES_WEIGHTED)
-
-            if country == "Japan":
-                city = random.choice(CITIES_JAPAN)
-            else:
-                city = random.choice(CITIES_OTHER)
-
-            registration_date = generate_realistic_registration_date().date()
+        with metrics.phase("generate"):
+            for i in range(current_batch_size):
+                params.extend(make_row())
 
-            values_list.append("(%s, %s, %s, %s, %s, %s)")
-            params.extend(
-                [email, first_name, last_name, registration_date, country, city]
+        try:
+            with metrics.phase("build_sql"):
+                values_clause = ",".join([row_placeholders] * current_batch_size)
+                query = f"""
+                INSERT INTO {table} ({", ".join(columns)})
+                VALUES {values_clause}
+                """
+
+            execute_batch(
+                conn, cursor, converter, query, params, current_batch_size, metrics
+            )
+            print(
+                f"  📊 {batch_end:,} / {count:,} 件完了 ({metrics.current_rate():,.0f} 行/秒)"
             )
 
-        values_clause = ",".join(values_list)
-        query = f"""
-        INSERT INTO customers (email, first_name, last_name, registration_date, country, city)
-        VALUES {values_clause}
-        """
+        except mysql.connector.Error as e:
+            print(f"  💥 エラー: {e}")
+            break
 
-        cursor.execute(query, params)
-        conn.commit()
-        print(f"  📊 {batch_end:,} / {count:,} 件完了")
+    metrics.end_table(conn)
+    cursor.close()
 
+
+def fetch_id_ranges(conn):
+    """注文が参照する顧客IDと商品IDの範囲"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MIN(customer_id), MAX(customer_id) FROM customers")
+    customer_range = cursor.fetchone()
+    cursor.execute("SELECT MIN(product_id), MAX(product_id) FROM products")
+    product_range = cursor.fetchone()
     cursor.close()
+    return customer_range, product_range
+
+
+def bulk_insert_realistic_customers(conn, count=50000, metrics=None):
+    """現実的な分布の顧客データを生成"""
+    print(f"👥 現実的な顧客データ {count:,} 件を生成中...")
+
+    def make_row():
+        country = random.choice(COUNTRIES_WEIGHTED)
+        if country == "Japan":
+            city = random.choice(CITIES_JAPAN)
+        else:
+            city = random.choice(CITIES_OTHER)
+
+        return [
+            generate_unique_email(),
+            random.choice(FIRST_NAMES),
+            random.choice(LAST_NAMES),
+            generate_realistic_registration_date().date(),
+            country,
+            city,
+        ]
+
+    insert_in_batches(
+        conn,
+        "customers",
+        CUSTOMER_COLUMNS,
+        count,
+        25000,
+        make_row,
+        metrics or GeneratorMetrics(),
+    )
     print("✅ 顧客データ生成完了")
 
 
-def bulk_insert_realistic_products(conn, count=10000):
+def bulk_insert_realistic_products(conn, count=10000, metrics=None):
     """季節性を考慮した商品データを生成"""
     print(f"📦 季節性を考慮した商品データ {count:,} 件を生成中...")
+    metrics = metrics or GeneratorMetrics()
+    converter = MySQLConverter(DB_CONFIG["charset"])
     cursor = conn.cursor()
+    metrics.start_table("products", conn)
 
-    values_list = []
     params = []
 
-    for i in range(count):
-        season = random.choice(["winter", "spring", "summer", "autumn"])
-        seasonal_word = random.choice(SEASONAL_PRODUCTS[season])
-        product_word = random.choice(PRODUCT_WORDS)
-        product_name = f"{product_word} {seasonal_word}"
+    with metrics.phase("generate"):
+        for i in range(count):
+            season = random.choice(["winter", "spring", "summer", "autumn"])
+            seasonal_word = random.choice(SEASONAL_PRODUCTS[season])
+            product_word = random.choice(PRODUCT_WORDS)
+            product_name = f"{product_word} {seasonal_word}"
 
-        category = random.choice(CATEGORIES)
-        price = generate_realistic_price()
+            category = random.choice(CATEGORIES)
+            price = generate_realistic_price()
 
-        if category == "Electronics":
-            stock_quantity = random.randint(50, 500)
-        elif category in ["Clothing", "Books"]:
-            stock_quantity = random.randint(20, 200)
-        else:
-            stock_quantity = random.randint(5, 50)
+            if category == "Electronics":
+                stock_quantity = random.randint(50, 500)
+            elif category in ["Clothing", "Books"]:
+                stock_quantity = random.randint(20, 200)
+            else:
+                stock_quantity = random.randint(5, 50)
 
-        values_list.append("(%s, %s, %s, %s)")
-        params.extend([product_name, category, price, stock_quantity])
+            params.extend([product_name, category, price, stock_quantity])
 
-    values_clause = ",".join(values_list)
-    query = f"""
-    INSERT INTO products (product_name, category, price, stock_quantity)
-    VALUES {values_clause}
-    """
+    with metrics.phase("build_sql"):
+        values_clause = ",".join(["(%s, %s, %s, %s)"] * count)
+        query = f"""
+        INSERT INTO products (product_name, category, price, stock_quantity)
+        VALUES {values_clause}
+        """
 
-    cursor.execute(query, params)
-    conn.commit()
+    execute_batch(conn, cursor, converter, query, params, count, metrics)
+    metrics.end_table(conn)
     cursor.close()
     print("✅ 商品データ生成完了")
 
 
-def bulk_insert_realistic_orders(conn, count=1000000):
+def bulk_insert_realistic_orders(conn, count=1000000, metrics=None):
     """現実的な偏りを持つ注文データを生成"""
     print(f"🛒 注文データ {count:,} 件を生成中...")
-    cursor = conn.cursor()
-
-    # 顧客IDと商品IDの範囲を取得
-    cursor.execute("SELECT MIN(customer_id), MAX(customer_id) FROM customers")
-    min_customer_id, max_customer_id = cursor.fetchone()
-
-    cursor.execute("SELECT MIN(product_id), MAX(product_id) FROM products")
-    min_product_id, max_product_id = cursor.fetchone()
+    (min_customer_id, max_customer_id), (min_product_id, max_product_id) = (
+        fetch_id_ranges(conn)
+    )
 
-    batch_size = 50000
+    # 現実的な注文数量（1-3個が大半）
+    quantity_weights = [1] * 60 + [2] * 25 + [3] * 10 + [4, 5] * 2 + list(range(6, 11))
 
-    for batch_start in range(0, count, batch_size):
-        batch_end = min(batch_start + batch_size, count)
-        current_batch_size = batch_end - batch_start
+    def make_row():
+        # 80/20の法則：20%の顧客が80%の注文
+        if random.random() < 0.2:
+            customer_id = random.randint(
+                int(min_customer_id + (max_customer_id - min_customer_id) * 0.8),
+                max_customer_id,
+            )
+        else:
+            customer_id = random.randint(min_customer_id, max_customer_id)
 
-        values_list = []
-        params = []
+        # 人気商品に偏らせる（商品IDの上位30%が70%の注文）
+        if random.random() < 0.7:
+            product_id = random.randint(
+                int(min_product_id + (max_product_id - min_product_id) * 0.7),
+                max_product_id,
+            )
+        else:
+            product_id = random.randint(min_product_id, max_product_id)
 
-        for i in range(current_batch_size):
-            # 80/20の法則：20%の顧客が80%の注文
-            if random.random() < 0.2:
-                customer_id = random.randint(
-                    int(min_customer_id + (max_customer_id - min_customer_id) * 0.8),
-                    max_customer_id,
-                )
-            else:
-                customer_id = random.randint(min_customer_id, max_customer_id)
+        order_date = generate_realistic_date().date()
 
-            # 人気商品に偏らせる（商品IDの上位30%が70%の注文）
-            if random.random() < 0.7:
-                product_id = random.randint(
-                    int(min_product_id + (max_product_id - min_product_id) * 0.7),
-                    max_product_id,
-                )
-            else:
-                product_id = random.randint(min_product_id, max_product_id)
+        quantity = random.choice(quantity_weights)
 
-            order_date = generate_realistic_date().date()
+        unit_price = generate_realistic_price()
+        total_amount = round(unit_price * quantity, 2)
+        status = random.choice(STATUSES_WEIGHTED)
 
-            # 現実的な注文数量（1-3個が大半）
-            quantity_weights = (
-                [1] * 60 + [2] * 25 + [3] * 10 + [4, 5] * 2 + list(range(6, 11))
+        # 配送国（顧客の国と異なる場合もある）
+        if random.random() < 0.9:
+            shipping_country = random.choice(COUNTRIES_WEIGHTED)
+        else:
+            shipping_country = random.choice(
+                ["Japan", "USA", "Germany", "UK", "France"]
             )
-            quantity = random.choice(quantity_weights)
-
-            unit_price = generate_realistic_price()
-            total_amount = round(unit_price * quantity, 2)
-            status = random.choice(STATUSES_WEIGHTED)
 
-            # 配送国（顧客の国と異なる場合もある）
-            if random.random() < 0.9:
-                shipping_country = random.choice(COUNTRIES_WEIGHTED)
-            else:
-                shipping_country = random.choice(
-                    ["Japan", "USA", "Germany", "UK", "France"]
-                )
+        # 配送都市
+        if shipping_country == "Japan":
+            shipping_city = random.choice(CITIES_JAPAN)
+        else:
+            shipping_city = random.choice(CITIES_OTHER)
+
+        payment_method = random.choice(PAYMENT_METHODS)
+
+        return [
+            customer_id,
+            product_id,
+            order_date,
+            quantity,
+            unit_price,
+            total_amount,
+            status,
+            shipping_country,
+            shipping_city,
+            payment_method,
+        ]
+
+    insert_in_batches(
+        conn, "orders", ORDER_COLUMNS, count, 50000, make_row, metrics or GeneratorMetrics()
+    )
+    print("✅ 注文データ生成完了")
 
-            # 配送都市
-            if shipping_country == "Japan":
-                shipping_city = random.choice(CITIES_JAPAN)
-            else:
-                shipping_city = random.choice(CITIES_OTHER)
-
-            payment_method = random.choice(PAYMENT_METHODS)
-
-            values_list.append("(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
-            params.extend(
-                [
-                    customer_id,
-                    product_id,
-                    order_date,
-                    quantity,
-                    unit_price,
-                    total_amount,
-                    status,
-                    shipping_country,
-                    shipping_city,
-                    payment_method,
-                ]
-            )
 
-        try:
-            values_clause = ",".join(values_list)
-            query = f"""
-            INSERT INTO orders (customer_id, product_id, order_date, quantity, unit_price, 
-                               total_amount, status, shipping_country, shipping_city, payment_method)
-            VALUES {values_clause}
-            """
+def bulk_insert_profiled_customers(conn, count, profile, metrics=None):
+    """分布プロファイルから顧客データを生成"""
+    print(f"👥 プロファイルに従った顧客データ {count:,} 件を生成中...")
+    first_names = profile.categorical("customers", "first_name")
+    last_names = profile.categorical("customers", "last_name")
+    countries = profile.categorical("customers", "country")
+    domains = profile.categorical("customers", "email_domain")
+    registration_ages = profile.numeric("customers", "registration_age_days")
+    today = datetime.now().date()
+
+    def make_row():
+        country = countries.sample()
+        return [
+            f"user_{str(uuid.uuid4())[:8]}@{domains.sample()}",
+            first_names.sample(),
+            last_names.sample(),
+            today - timedelta(days=registration_ages.sample()),
+            country,
+            profile.conditional("customers", "city|country", country).sample(),
+        ]
+
+    insert_in_batches(
+        conn,
+        "customers",
+        CUSTOMER_COLUMNS,
+        count,
+        25000,
+        make_row,
+        metrics or GeneratorMetrics(),
+    )
+    print("✅ 顧客データ生成完了")
 
-            cursor.execute(query, params)
-            conn.commit()
-            print(f"  📊 {batch_end:,} / {count:,} 件完了")
 
-        except mysql.connector.Error as e:
-            print(f"  💥 エラー: {e}")
-            break
+def bulk_insert_profiled_orders(conn, count, profile, metrics=None):
+    """分布プロファイルから注文データを生成（国→都市、経過日数→ステータス、数量→単価の相関つき）"""
+    print(f"🛒 プロファイルに従った注文データ {count:,} 件を生成中...")
+    (min_customer_id, max_customer_id), (min_product_id, max_product_id) = (
+        fetch_id_ranges(conn)
+    )
 
-    cursor.close()
+    customer_positions = profile.numeric("orders", "customer_position")
+    product_positions = profile.numeric("orders", "product_position")
+    order_ages = profile.numeric("orders", "order_age_days")
+    quantities = profile.categorical("orders", "quantity")
+    countries = profile.categorical("orders", "shipping_country")
+    payment_methods = profile.categorical("orders", "payment_method")
+    today = datetime.now().date()
+
+    def make_row():
+        age = order_ages.sample()
+        quantity = quantities.sample()
+        unit_price = profile.conditional("orders", "unit_price|quantity", quantity).sample()
+        shipping_country = countries.sample()
+        return [
+            position_to_id(customer_positions.sample(), min_customer_id, max_customer_id),
+            position_to_id(product_positions.sample(), min_product_id, max_product_id),
+            today - timedelta(days=age),
+            quantity,
+            unit_price,
+            round(unit_price * quantity, 2),
+            profile.conditional("orders", "status|order_age_bucket", age_bucket(age)).sample(),
+            shipping_country,
+            profile.conditional(
+                "orders", "shipping_city|shipping_country", shipping_country
+            ).sample(),
+            payment_methods.sample(),
+        ]
+
+    insert_in_batches(
+        conn, "orders", ORDER_COLUMNS, count, 50000, make_row, metrics or GeneratorMetrics()
+    )
     print("✅ 注文データ生成完了")
 
 
@@ -464,8 +776,63 @@ def show_final_status(conn):
     cursor.close()
 
 
+def parse_args():
+    """コマンドライン引数"""
+    parser = argparse.ArgumentParser(description="現実的なサンプルデータ生成")
+    parser.add_argument(
+        "--scale-factor",
+        type=float,
+        default=1.0,
+        help="生成件数の倍率（1.0 で顧客5万・商品1万・注文100万件）",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        help="ステージ別計測結果の出力先ファイル（指定時はパラメータ変換を分けて計測する）",
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=["json", "prometheus"],
+        default="json",
+        help="計測結果の形式（prometheus はテキスト形式）",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="tracemalloc でテーブルごとのPythonメモリピークを計測（生成が遅くなる）",
+    )
+    parser.add_argument(
+        "--profile",
+        help="distribution_profile.py capture で取得した分布プロファイル（名前または .json のパス）",
+    )
+    parser.add_argument(
+        "--profile-rows",
+        action="store_true",
+        help="顧客・注文の件数もプロファイル取得元に合わせる（--scale-factor を掛ける）",
+    )
+    return parser.parse_args()
+
+
 def main():
     """メイン処理"""
+    args = parse_args()
+    customer_count = int(50000 * args.scale_factor)
+    product_count = int(10000 * args.scale_factor)
+    order_count = int(1000000 * args.scale_factor)
+    metrics = GeneratorMetrics(
+        args.scale_factor,
+        trace_memory=args.trace_memory,
+        split_convert=bool(args.metrics_out),
+    )
+
+    profile = None
+    if args.profile:
+        profile = DistributionProfile.load(profile_path(args.profile))
+        print(f"🔬 分布プロファイル: {args.profile} (取得日 {profile.data['as_of']})")
+        if args.profile_rows:
+            tables = profile.data["tables"]
+            customer_count = int(tables["customers"]["rows"] * args.scale_factor)
+            order_count = int(tables["orders"]["rows"] * args.scale_factor)
+
     print("🚀 完全クリーンスタート版データ生成開始")
     print("💥 既存インデックス全削除 → 現実的データ生成")
     print("=" * 60)
@@ -483,20 +850,29 @@ def main():
         optimize_mysql_for_bulk_insert(conn)
 
         # ステップ4: 現実的なデータ生成
-        bulk_insert_realistic_customers(conn, 50000)
-        bulk_insert_realistic_products(conn, 10000)
-        bulk_insert_realistic_orders(conn, 1000000)
+        if profile:
+            bulk_insert_profiled_customers(conn, customer_count, profile, metrics)
+            bulk_insert_realistic_products(conn, product_count, metrics)
+            bulk_insert_profiled_orders(conn, order_count, profile, metrics)
+        else:
+            bulk_insert_realistic_customers(conn, customer_count, metrics)
+            bulk_insert_realistic_products(conn, product_count, metrics)
+            bulk_insert_realistic_orders(conn, order_count, metrics)
 
         # ステップ5: MySQL設定を元に戻す
         restore_mysql_settings(conn)
 
         # ステップ6: 最終状況レポート
         show_final_status(conn)
+        metrics.show_summary()
+        if args.metrics_out:
+            metrics.write(args.metrics_out, args.metrics_format)
 
+        total_count = customer_count + product_count + order_count
         print("\n" + "🎉" * 20)
         print("💯 完全クリーンスタート版データ生成完了！")
         print("🧹 既存インデックス: 完全削除済み")
-        print("📊 現実的データ: 106万件生成済み")
+        print(f"📊 現実的データ: {total_count:,}件生成済み")
         print("⚡ ベンチマーク準備: 完璧な状態")
 
     except Exception as e:
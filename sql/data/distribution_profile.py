@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+実データの分布プロファイルの取得と再現
+既存テーブルからヒストグラム・上位値の頻度・条件付き分布（国→都市、注文経過日数→ステータス、
+数量→単価）を JSON に保存し、clean_data_generator.py --profile でエイリアス法により再現する。
+compare で生成後のデータと元プロファイルの差（全変動距離・分位点のずれ）を確認できる
+"""
+
+import argparse
+import json
+import os
+import random
+from bisect import bisect_right
+from datetime import date, datetime
+
+import mysql.connector
+
+from benchmark import DB_CONFIG, clear_cursor_safely
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+# プロファイルの形式が変わったら上げる
+PROFILE_FORMAT_VERSION = 2
+
+HISTOGRAM_BUCKETS = 64
+TOP_K = 100
+
+# 注文経過日数の区切り（MySQL の INTERVAL() と bisect_right が同じ番号を返す）
+AGE_BUCKETS = [30, 90, 180, 365, 730]
+
+# 日付は取得日からの経過日数として保存し、生成時は当日基準で戻す
+# （「直近12ヶ月」などの条件の選択率を取得時と揃えるため）
+CATEGORICAL_COLUMNS = {
+    "customers": {
+        "first_name": "first_name",
+        "last_name": "last_name",
+        "country": "country",
+        "email_domain": "SUBSTRING_INDEX(email, '@', -1)",
+    },
+    "orders": {
+        "quantity": "quantity",
+        "status": "status",
+        "shipping_country": "shipping_country",
+        "payment_method": "payment_method",
+    },
+}
+
+# 列名: (式, 値の種類)。{as_of} は取得日、{customer_*}/{product_*} は参照先の ID 範囲
+NUMERIC_COLUMNS = {
+    "customers": {
+        "registration_age_days": ("DATEDIFF('{as_of}', registration_date)", "int"),
+    },
+    "orders": {
+        "order_age_days": ("DATEDIFF('{as_of}', order_date)", "int"),
+        "unit_price": ("unit_price", "decimal"),
+        # 顧客・商品の偏りは ID 範囲内の位置（0〜1）として保存し、生成件数が違っても再現する
+        "customer_position": (
+            "(customer_id - {customer_min}) / GREATEST({customer_max} - {customer_min}, 1)",
+            "float",
+        ),
+        "product_position": (
+            "(product_id - {product_min}) / GREATEST({product_max} - {product_min}, 1)",
+            "float",
+        ),
+    },
+}
+
+# "列|条件": (条件の式, 列の式)
+CONDITIONAL_CATEGORICAL = {
+    "customers": {
+        "city|country": ("country", "city"),
+    },
+    "orders": {
+        "shipping_city|shipping_country": ("shipping_country", "shipping_city"),
+        "status|order_age_bucket": (
+            "INTERVAL(DATEDIFF('{as_of}', order_date), "
+            + ", ".join(str(b) for b in AGE_BUCKETS)
+            + ")",
+            "status",
+        ),
+    },
+}
+
+# "列|条件": (条件の式, 列の式, 値の種類)
+CONDITIONAL_NUMERIC = {
+    "orders": {
+        "unit_price|quantity": ("quantity", "unit_price", "decimal"),
+    },
+}
+
+
+class AliasTable:
+    """
+    Vose のエイリアス法による離散分布のサンプラー
+
+    構築 O(n)、1回のサンプリングは乱数1個で O(1)（重み付きリストの複製が不要）
+    """
+
+    def __init__(self, values, weights):
+        n = len(values)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.values = list(values)
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # 残りは浮動小数点誤差で 1 に満たないだけなので確率 1 のまま
+
+    def sample_index(self):
+        u = random.random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def sample(self):
+        return self.values[self.sample_index()]
+
+
+class HistogramSampler:
+    """等深ヒストグラム [(下限, 上限, 件数)] から値を生成（バケット内は一様）"""
+
+    def __init__(self, buckets, kind):
+        self.buckets = buckets
+        self.kind = kind
+        self.table = AliasTable(range(len(buckets)), [count for _, _, count in buckets])
+
+    def sample(self):
+        low, high, _ = self.buckets[self.table.sample_index()]
+        if self.kind == "int":
+            return random.randint(int(low), int(high))
+        value = random.uniform(low, high)
+        return round(value, 2) if self.kind == "decimal" else value
+
+
+class DistributionProfile:
+    """保存済みプロファイルからのサンプリング"""
+
+    def __init__(self, data):
+        if data.get("format_version") != PROFILE_FORMAT_VERSION:
+            raise ValueError(
+                f"プロファイル形式 {data.get('format_version')} には対応していません"
+            )
+        self.data = data
+        self._samplers = {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def has_table(self, table):
+        return table in self.data["tables"]
+
+    def categorical(self, table, column):
+        key = (table, column)
+        if key not in self._samplers:
+            table_spec = self.data["tables"][table]
+            spec = table_spec["categorical"][column]
+            values, weights = with_tail(spec, column, table_spec["rows"])
+            self._samplers[key] = AliasTable(values, weights)
+        return self._samplers[key]
+
+    def numeric(self, table, column):
+        key = (table, column)
+        if key not in self._samplers:
+            spec = self.data["tables"][table]["numeric"][column]
+            self._samplers[key] = HistogramSampler(spec["buckets"], spec["kind"])
+        return self._samplers[key]
+
+    def conditional(self, table, name, given):
+        """
+        条件付き分布のサンプラー
+
+        条件の値がプロファイルに無ければ全グループを合わせた分布で代用する
+        """
+        given = str(given)
+        key = (table, name, given)
+        if key not in self._samplers:
+            spec = self.data["tables"][table]["conditional"][name]
+            groups = spec["groups"]
+            group = groups.get(given)
+            if spec["kind"] == "categorical":
+                if group is None:
+                    merged = {}
+                    for g in groups.values():
+                        for value, weight in zip(g["values"], g["weights"]):
+                            merged[value] = merged.get(value, 0) + weight
+                    group = {"values": list(merged), "weights": list(merged.values())}
+                values, weights = with_tail(
+                    group,
+                    name.split("|")[0],
+                    group.get("total", sum(group["weights"])),
+                    f"{given}_",
+                )
+                sampler = AliasTable(values, weights)
+            else:
+                if group is None:
+                    group = {"buckets": [b for g in groups.values() for b in g["buckets"]]}
+                sampler = HistogramSampler(group["buckets"], spec["kind"])
+            self._samplers[key] = sampler
+        return self._samplers[key]
+
+
+def with_tail(spec, column, total, salt=""):
+    """
+    上位値に、取得時に切り捨てた残りの値を合成して足す
+
+    distinct - len(values) 個の合成値に残りの件数を均等に割り振り、異なり値の数
+    （インデックスのカーディナリティ）を取得元に揃える
+    """
+    values = list(spec["values"])
+    weights = list(spec["weights"])
+    tail_count = spec.get("distinct", len(values)) - len(values)
+    tail_weight = total - sum(weights)
+    if tail_count <= 0 or tail_weight <= 0:
+        return values, weights
+
+    if values and all(isinstance(v, int) for v in values):
+        start = max(values) + 1
+        values.extend(range(start, start + tail_count))
+    else:
+        values.extend(f"{column}_{salt}{i}" for i in range(tail_count))
+    weights.extend([tail_weight / tail_count] * tail_count)
+    return values, weights
+
+
+def age_bucket(age_days):
+    """経過日数の区分番号（SQL 側の INTERVAL() と同じ）"""
+    return bisect_right(AGE_BUCKETS, age_days)
+
+
+def position_to_id(position, min_id, max_id):
+    """0〜1 の位置を ID 範囲に戻す"""
+    return min(max_id, max(min_id, min_id + round(position * (max_id - min_id))))
+
+
+def profile_path(name):
+    """名前ならプロファイル置き場のファイル、パスならそのまま"""
+    if name.endswith(".json") or os.sep in name:
+        return name
+    return os.path.join(PROFILE_DIR, f"{name}.json")
+
+
+def fetch_all(cursor, sql):
+    clear_cursor_safely(cursor)
+    cursor.execute(sql)
+    rows = cursor.fetchall()
+    clear_cursor_safely(cursor)
+    return rows
+
+
+def to_number(value, kind):
+    return int(value) if kind == "int" else float(value)
+
+
+def capture_categorical(cursor, table, expression, rows):
+    """上位 TOP_K 値の頻度と異なり値の数"""
+    top = fetch_all(
+        cursor,
+        f"SELECT {expression} AS v, COUNT(*) AS c FROM {table} "
+        f"GROUP BY v ORDER BY c DESC LIMIT {TOP_K}",
+    )
+    distinct = fetch_all(cursor, f"SELECT COUNT(DISTINCT {expression}) FROM {table}")[0][0]
+    weights = [count for _, count in top]
+    return {
+        "values": [value if isinstance(value, str) else int(value) for value, _ in top],
+        "weights": weights,
+        "distinct": distinct,
+        "coverage": sum(weights) / rows if rows else 0.0,
+    }
+
+
+def capture_histogram(cursor, table, expression, kind):
+    """NTILE による等深ヒストグラム"""
+    buckets = fetch_all(
+        cursor,
+        f"""
+        SELECT MIN(v), MAX(v), COUNT(*) FROM (
+            SELECT {expression} AS v,
+                   NTILE({HISTOGRAM_BUCKETS}) OVER (ORDER BY {expression}) AS b
+            FROM {table}
+        ) t
+        GROUP BY b ORDER BY b
+        """,
+    )
+    return {
+        "kind": kind,
+        "buckets": [
+            [to_number(low, kind), to_number(high, kind), count]
+            for low, high, count in buckets
+        ],
+    }
+
+
+def capture_conditional_categorical(cursor, table, given_expression, expression):
+    """条件の値ごとの上位値の頻度"""
+    rows = fetch_all(
+        cursor,
+        f"SELECT {given_expression} AS g, {expression} AS v, COUNT(*) AS c FROM {table} "
+        "GROUP BY g, v ORDER BY g, c DESC",
+    )
+    groups = {}
+    for given, value, count in rows:
+        group = groups.setdefault(
+            str(given), {"values": [], "weights": [], "distinct": 0, "total": 0}
+        )
+        group["distinct"] += 1
+        group["total"] += count
+        if len(group["values"]) < TOP_K:
+            group["values"].append(value if isinstance(value, str) else int(value))
+            group["weights"].append(count)
+    return {"kind": "categorical", "groups": groups}
+
+
+def capture_conditional_histogram(cursor, table, given_expression, expression, kind):
+    """条件の値ごとの等深ヒストグラム（上位 TOP_K 個の条件値のみ）"""
+    rows = fetch_all(
+        cursor,
+        f"""
+        SELECT g, MIN(v), MAX(v), COUNT(*) FROM (
+            SELECT {given_expression} AS g, {expression} AS v,
+                   NTILE({HISTOGRAM_BUCKETS}) OVER (
+                       PARTITION BY {given_expression} ORDER BY {expression}
+                   ) AS b
+            FROM {table}
+        ) t
+        GROUP BY g, b ORDER BY g, b
+        """,
+    )
+    groups = {}
+    for given, low, high, count in rows:
+        groups.setdefault(str(given), {"buckets": []})["buckets"].append(
+            [to_number(low, kind), to_number(high, kind), count]
+        )
+    largest = sorted(
+        groups, key=lambda g: sum(b[2] for b in groups[g]["buckets"]), reverse=True
+    )[:TOP_K]
+    return {"kind": kind, "groups": {g: groups[g] for g in largest}}
+
+
+def capture_profile(cursor, schema, as_of=None):
+    """現在のスキーマから分布プロファイルを取得"""
+    as_of = as_of or date.today()
+    id_ranges = {}
+    for table, column in [("customers", "customer_id"), ("products", "product_id")]:
+        low, high = fetch_all(cursor, f"SELECT MIN({column}), MAX({column}) FROM {table}")[0]
+        prefix = table[:-1]
+        id_ranges[f"{prefix}_min"] = low or 0
+        id_ranges[f"{prefix}_max"] = high or 0
+    placeholders = {"as_of": as_of, **id_ranges}
+
+    tables = {}
+    for table in ["customers", "orders"]:
+        rows = fetch_all(cursor, f"SELECT COUNT(*) FROM {table}")[0][0]
+        print(f"  📋 {table}: {rows:,}件")
+        profile = {"rows": rows, "categorical": {}, "numeric": {}, "conditional": {}}
+
+        for column, expression in CATEGORICAL_COLUMNS.get(table, {}).items():
+            profile["categorical"][column] = capture_categorical(
+                cursor, table, expression, rows
+            )
+        for column, (expression, kind) in NUMERIC_COLUMNS.get(table, {}).items():
+            profile["numeric"][column] = capture_histogram(
+                cursor, table, expression.format(**placeholders), kind
+            )
+        for name, (given, expression) in CONDITIONAL_CATEGORICAL.get(table, {}).items():
+            profile["conditional"][name] = capture_conditional_categorical(
+                cursor, table, given.format(**placeholders), expression
+            )
+        for name, (given, expression, kind) in CONDITIONAL_NUMERIC.get(table, {}).items():
+            profile["conditional"][name] = capture_conditional_histogram(
+                cursor, table, given.format(**placeholders), expression, kind
+            )
+        tables[table] = profile
+
+    return {
+        "format_version": PROFILE_FORMAT_VERSION,
+        "captured_at": datetime.now().isoformat(timespec="seconds"),
+        "as_of": str(as_of),
+        "schema": schema,
+        "id_ranges": id_ranges,
+        "tables": tables,
+    }
+
+
+def total_variation(source, generated):
+    """2つの頻度分布 {値: 件数} の全変動距離（0 = 一致, 1 = 完全に別）"""
+    source_total = sum(source.values()) or 1
+    generated_total = sum(generated.values()) or 1
+    keys = set(source) | set(generated)
+    return 0.5 * sum(
+        abs(source.get(k, 0) / source_total - generated.get(k, 0) / generated_total)
+        for k in keys
+    )
+
+
+def quantiles(buckets, points=(0.1, 0.25, 0.5, 0.75, 0.9)):
+    """ヒストグラムの分位点（バケット上限で近似）"""
+    total = sum(count for _, _, count in buckets) or 1
+    result = []
+    cumulative = 0
+    index = 0
+    for point in points:
+        while index < len(buckets) - 1 and (cumulative + buckets[index][2]) / total < point:
+            cumulative += buckets[index][2]
+            index += 1
+        result.append(buckets[index][1])
+    return result
+
+
+def quantile_drift(source, generated):
+    """分位点のずれの最大値（元の値域に対する割合）"""
+    source_q = quantiles(source["buckets"])
+    generated_q = quantiles(generated["buckets"])
+    span = (source["buckets"][-1][1] - source["buckets"][0][0]) or 1
+    return max(abs(a - b) for a, b in zip(source_q, generated_q)) / span
+
+
+def ndv_drift(source, generated):
+    """異なり値の数の相対誤差"""
+    return abs(generated - source) / max(source, 1)
+
+
+def compare_profiles(source, generated):
+    """
+    [(テーブル, 項目, 指標名, 値)]
+
+    TVD は上位値のみで比べるので、切り捨てた分は異なり値の数の相対誤差（NDVずれ）で確認する
+    """
+    report = []
+    for table, spec in source["tables"].items():
+        other = generated["tables"].get(table)
+        if not other:
+            continue
+        for column, dist in spec["categorical"].items():
+            gen = other["categorical"][column]
+            report.append(
+                (
+                    table,
+                    column,
+                    "TVD",
+                    total_variation(
+                        dict(zip(map(str, dist["values"]), dist["weights"])),
+                        dict(zip(map(str, gen["values"]), gen["weights"])),
+                    ),
+                )
+            )
+            report.append(
+                (table, column, "NDVずれ", ndv_drift(dist["distinct"], gen["distinct"]))
+            )
+        for column, hist in spec["numeric"].items():
+            report.append(
+                (table, column, "分位点ずれ", quantile_drift(hist, other["numeric"][column]))
+            )
+        for name, cond in spec["conditional"].items():
+            gen_groups = other["conditional"][name]["groups"]
+            weighted = 0.0
+            weighted_ndv = 0.0
+            total = 0
+            for given, group in cond["groups"].items():
+                gen_group = gen_groups.get(given)
+                if cond["kind"] == "categorical":
+                    weight = sum(group["weights"])
+                    distance = (
+                        total_variation(
+                            dict(zip(map(str, group["values"]), group["weights"])),
+                            dict(zip(map(str, gen_group["values"]), gen_group["weights"])),
+                        )
+                        if gen_group
+                        else 1.0
+                    )
+                    weighted_ndv += weight * (
+                        ndv_drift(group["distinct"], gen_group["distinct"])
+                        if gen_group
+                        else 1.0
+                    )
+                else:
+                    weight = sum(b[2] for b in group["buckets"])
+                    distance = quantile_drift(group, gen_group) if gen_group else 1.0
+                weighted += weight * distance
+                total += weight
+            metric = "TVD" if cond["kind"] == "categorical" else "分位点ずれ"
+            report.append((table, name, f"条件付き{metric}", weighted / total if total else 0.0))
+            if cond["kind"] == "categorical":
+                report.append(
+                    (table, name, "条件付きNDVずれ", weighted_ndv / total if total else 0.0)
+                )
+    return report
+
+
+
+def connect(schema):
+    return mysql.connector.connect(**{**DB_CONFIG, "database": schema})
+
+
+def capture_command(name, schema):
+    schema = schema or DB_CONFIG["database"]
+    path = profile_path(name)
+    print(f"🔬 分布プロファイル取得: {schema} → {path}")
+
+    conn = connect(schema)
+    cursor = conn.cursor()
+    try:
+        profile = capture_profile(cursor, schema)
+    finally:
+        clear_cursor_safely(cursor)
+        cursor.close()
+        conn.close()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2, default=str)
+    print(f"✅ 保存しました: {path}")
+
+
+def compare_command(name, schema, threshold):
+    schema = schema or DB_CONFIG["database"]
+    path = profile_path(name)
+    with open(path, encoding="utf-8") as f:
+        source = json.load(f)
+    print(f"🔍 {path} と {schema} の現在のデータを比較")
+
+    conn = connect(schema)
+    cursor = conn.cursor()
+    try:
+        current = capture_profile(cursor, schema)
+    finally:
+        clear_cursor_safely(cursor)
+        cursor.close()
+        conn.close()
+
+    worst = 0.0
+    for table, column, metric, value in compare_profiles(source, current):
+        mark = "✅" if value <= threshold else "❌"
+        print(f"  {mark} {table}.{column:32} {metric:14} {value:.4f}")
+        worst = max(worst, value)
+    print(f"\n📊 最大のずれ: {worst:.4f}（許容 {threshold}）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="実データの分布プロファイル取得・比較")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture_parser = subparsers.add_parser("capture", help="現在のテーブルから取得")
+    capture_parser.add_argument("name", help="プロファイル名または .json のパス")
+    capture_parser.add_argument("--schema", help="取得元スキーマ（省略時は explain_test）")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="プロファイルと現在のテーブルの分布を比較"
+    )
+    compare_parser.add_argument("name", help="プロファイル名または .json のパス")
+    compare_parser.add_argument("--schema", help="比較対象スキーマ（省略時は explain_test）")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.05, help="許容するずれ（TVD・分位点ずれ）"
+    )
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "capture":
+            capture_command(args.name, args.schema)
+        elif args.command == "compare":
+            compare_command(args.name, args.schema, args.threshold)
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+データ投入後のインデックス構築ステージ
+innodb_ddl_threads / innodb_ddl_buffer_size / innodb_parallel_read_threads を
+調整してインデックスプロファイルを構築し、インデックスごとの所要時間を計測する
+"""
+
+import argparse
+import time
+
+import mysql.connector
+
+from benchmark import (
+    DB_CONFIG,
+    DDL_SETTINGS,
+    OPTIMAL_INDEXES,
+    apply_ddl_settings,
+    clear_cursor_safely,
+)
+
+
+def _pick(*names):
+    return [index for index in OPTIMAL_INDEXES if index[1] in names]
+
+
+# 名前付きインデックスプロファイル
+INDEX_PROFILES = {
+    "none": [],
+    "single": _pick(
+        "idx_shipping_country", "idx_order_date", "idx_total_amount", "idx_status"
+    ),
+    "composite": _pick(
+        "idx_date_amount", "idx_amount_date", "idx_country_date", "idx_status_amount"
+    ),
+    "covering": _pick("idx_covering_range"),
+    "optimal": OPTIMAL_INDEXES,
+}
+
+# 比較モードで試すDDL並列度の組み合わせ
+# server_default は起動時に接続先サーバーの GLOBAL 値を読んで埋める
+DDL_PRESETS = {
+    "serial": {
+        "innodb_ddl_threads": 1,
+        "innodb_ddl_buffer_size": 1024 * 1024,
+        "innodb_parallel_read_threads": 1,
+    },
+    "server_default": None,
+    "tuned": DDL_SETTINGS,
+    "wide": {
+        "innodb_ddl_threads": 8,
+        "innodb_ddl_buffer_size": 256 * 1024 * 1024,
+        "innodb_parallel_read_threads": 8,
+    },
+}
+
+
+def server_default_settings(cursor):
+    """サーバーの GLOBAL 値（セッションを変更していない場合の値）"""
+    clear_cursor_safely(cursor)
+    cursor.execute(
+        "SELECT @@GLOBAL.innodb_ddl_threads, @@GLOBAL.innodb_ddl_buffer_size, "
+        "@@GLOBAL.innodb_parallel_read_threads"
+    )
+    threads, buffer_size, read_threads = cursor.fetchone()
+    clear_cursor_safely(cursor)
+    return {
+        "innodb_ddl_threads": int(threads),
+        "innodb_ddl_buffer_size": int(buffer_size),
+        "innodb_parallel_read_threads": int(read_threads),
+    }
+
+
+def existing_index_names(cursor, table):
+    """テーブルに存在するインデックス名の集合"""
+    clear_cursor_safely(cursor)
+    cursor.execute(
+        """
+        SELECT DISTINCT INDEX_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    names = {row[0] for row in cursor.fetchall()}
+    clear_cursor_safely(cursor)
+    return names
+
+
+def drop_profile_indexes(cursor, indexes):
+    """プロファイルに含まれるインデックスだけを削除"""
+    for table in sorted({table for table, _, _ in indexes}):
+        existing = existing_index_names(cursor, table)
+        for index_table, index_name, _ in indexes:
+            if index_table == table and index_name in existing:
+                clear_cursor_safely(cursor)
+                cursor.execute(f"DROP INDEX {index_name} ON {table}")
+                clear_cursor_safely(cursor)
+
+
+def build_index_profile(cursor, indexes, settings=None, mode="each"):
+    """
+    インデックスを構築して [(テーブル, インデックス名, 秒数)] を返す
+
+    mode="each"  : CREATE INDEX を1本ずつ実行（インデックスごとの時間を計測）
+    mode="batch" : テーブルごとに ALTER TABLE ... ADD INDEX をまとめて1回で実行
+                   （クラスタインデックスの走査が1回で済む。時間はテーブル単位）
+    """
+    apply_ddl_settings(cursor, settings)
+    timings = []
+
+    if mode == "each":
+        for table, index_name, columns in indexes:
+            clear_cursor_safely(cursor)
+            start = time.perf_counter()
+            cursor.execute(
+                f"CREATE INDEX {index_name} ON {table}({columns}) "
+                "ALGORITHM=INPLACE LOCK=NONE"
+            )
+            clear_cursor_safely(cursor)
+            elapsed = time.perf_counter() - start
+            timings.append((table, index_name, elapsed))
+            print(f"    ✅ {table}.{index_name} ({columns}): {elapsed:.2f}秒")
+
+    elif mode == "batch":
+        for table in sorted({table for table, _, _ in indexes}):
+            names = [name for t, name, _ in indexes if t == table]
+            clauses = ", ".join(
+                f"ADD INDEX {name} ({columns})"
+                for t, name, columns in indexes
+                if t == table
+            )
+            clear_cursor_safely(cursor)
+            start = time.perf_counter()
+            cursor.execute(f"ALTER TABLE {table} {clauses}, ALGORITHM=INPLACE, LOCK=NONE")
+            clear_cursor_safely(cursor)
+            elapsed = time.perf_counter() - start
+            timings.append((table, "+".join(names), elapsed))
+            print(f"    ✅ {table}: {len(names)}本を一括作成 {elapsed:.2f}秒")
+
+    else:
+        raise ValueError(f"unknown build mode: {mode}")
+
+    return timings
+
+
+def format_settings(settings):
+    """DDL設定を1行で表示用に整形"""
+    return (
+        f"threads={settings['innodb_ddl_threads']}, "
+        f"buffer={settings['innodb_ddl_buffer_size'] // (1024 * 1024)}MB, "
+        f"read_threads={settings['innodb_parallel_read_threads']}"
+    )
+
+
+def run_build(cursor, profile, preset, mode):
+    """1つのプリセットでプロファイルを作り直して合計時間を返す"""
+    indexes = INDEX_PROFILES[profile]
+    settings = DDL_PRESETS[preset]
+
+    print(f"\n⚡ {profile} を構築 [{preset}: {format_settings(settings)}, mode={mode}]")
+    drop_profile_indexes(cursor, indexes)
+
+    start = time.perf_counter()
+    timings = build_index_profile(cursor, indexes, settings, mode)
+    total = time.perf_counter() - start
+    print(f"  🏁 合計: {total:.2f}秒")
+    return total, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="インデックス構築ステージ")
+    parser.add_argument("--profile", choices=INDEX_PROFILES, default="optimal")
+    parser.add_argument("--preset", choices=DDL_PRESETS, default="tuned")
+    parser.add_argument("--mode", choices=["each", "batch"], default="each")
+    parser.add_argument(
+        "--compare", action="store_true", help="全プリセットで構築して所要時間を比較"
+    )
+    parser.add_argument(
+        "--drop-after", action="store_true", help="構築後にプロファイルのインデックスを削除"
+    )
+    args = parser.parse_args()
+
+    print("🏗️ インデックス構築ステージ")
+    print("=" * 60)
+
+    conn = None
+    cursor = None
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        DDL_PRESETS["server_default"] = server_default_settings(cursor)
+
+        presets = list(DDL_PRESETS) if args.compare else [args.preset]
+        results = {}
+        for preset in presets:
+            results[preset] = run_build(cursor, args.profile, preset, args.mode)
+
+        if args.compare:
+            print("\n📊 DDL設定別の構築時間:")
+            baseline = results[presets[0]][0]
+            for preset, (total, _) in results.items():
+                speedup = baseline / total if total > 0 else 0
+                print(
+                    f"  {preset:15} {total:8.2f}秒  ({speedup:.1f}倍)  "
+                    f"{format_settings(DDL_PRESETS[preset])}"
+                )
+
+        if args.drop_after:
+            drop_profile_indexes(cursor, INDEX_PROFILES[args.profile])
+            print("\n🗑️ プロファイルのインデックスを削除")
+
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+    finally:
+        if cursor:
+            clear_cursor_safely(cursor)
+            cursor.close()
+        if conn:
+            conn.close()
+
+    print("\n🎉 インデックス構築ステージ完了")
+
+
+if __name__ == "__main__":
+    main()
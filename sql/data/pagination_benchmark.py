@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+深いページングのベンチマーク: OFFSET ページング vs キーセット（シーク）ページング
+date_range_massive / country_filter_massive をページ単位で最後まで辿り、
+ページの深さごとのレイテンシと検査行数（Handler_read_*）を記録する
+"""
+
+import argparse
+import csv
+import time
+
+import mysql.connector
+
+from benchmark import DB_CONFIG, QUERIES, clear_cursor_safely, drop_all_indexes
+from index_builder import INDEX_PROFILES, build_index_profile
+
+# ページングするクエリ（ORDER BY には一意にするため order_id を足す）
+PAGINATION_QUERIES = {
+    "date_range_massive": {
+        "select": "order_id, order_date, total_amount, shipping_country",
+        "where": "order_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)",
+        "total_rows": 10000,
+    },
+    "country_filter_massive": {
+        "select": "*",
+        "where": "shipping_country = 'Japan'",
+        "total_rows": 8000,
+    },
+}
+
+ORDER_BY = "ORDER BY order_date DESC, order_id DESC"
+
+BAR_WIDTH = 40
+
+
+def handler_reads(cursor):
+    """セッションの Handler_read_* の合計（ストレージエンジンから読んだ行数の目安）"""
+    clear_cursor_safely(cursor)
+    cursor.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+    total = sum(int(value) for _, value in cursor.fetchall())
+    clear_cursor_safely(cursor)
+    return total
+
+
+def status_overhead(cursor):
+    """SHOW STATUS 自体が増やす Handler_read_* の量"""
+    before = handler_reads(cursor)
+    after = handler_reads(cursor)
+    return after - before
+
+
+def offset_sql(spec, page_size, offset):
+    return (
+        f"SELECT {spec['select']} FROM orders WHERE {spec['where']} "
+        f"{ORDER_BY} LIMIT {page_size} OFFSET {offset}"
+    )
+
+
+def keyset_sql(spec, page_size, seek):
+    condition = spec["where"]
+    if seek:
+        # 行コンストラクタの不等号からはレンジが作られないので、
+        # order_date 単独の冗長な上限を足してシーク位置からインデックスを読ませる
+        condition += " AND order_date <= %s AND (order_date, order_id) < (%s, %s)"
+    return (
+        f"SELECT {spec['select']} FROM orders WHERE {condition} "
+        f"{ORDER_BY} LIMIT {page_size}"
+    )
+
+
+def run_page(cursor, sql, params, overhead):
+    """1ページ取得してレイテンシ・検査行数・結果行を返す"""
+    before = handler_reads(cursor)
+
+    clear_cursor_safely(cursor)
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    elapsed = time.perf_counter() - start
+    columns = cursor.column_names
+    clear_cursor_safely(cursor)
+
+    examined = handler_reads(cursor) - before - overhead
+    return elapsed * 1000, max(examined, 0), rows, columns
+
+
+def walk_pages(cursor, spec, page_size, mode, overhead):
+    """先頭から最後のページまで辿り [(ページ番号, 深さ, ms, 検査行数)] を返す"""
+    pages = spec["total_rows"] // page_size
+    results = []
+    seek = None
+
+    for page in range(pages):
+        depth = page * page_size
+        if mode == "offset":
+            latency, examined, rows, _ = run_page(
+                cursor, offset_sql(spec, page_size, depth), None, overhead
+            )
+        else:
+            params = (seek[0], *seek) if seek else None
+            latency, examined, rows, columns = run_page(
+                cursor, keyset_sql(spec, page_size, seek), params, overhead
+            )
+            if rows:
+                last = rows[-1]
+                seek = (
+                    last[columns.index("order_date")],
+                    last[columns.index("order_id")],
+                )
+
+        results.append((page + 1, depth, latency, examined))
+        if not rows:
+            break
+    return results
+
+
+def plot_ascii(title, offset_results, keyset_results, every):
+    """ページの深さごとのレイテンシを横棒で表示"""
+    peak = max(r[2] for r in offset_results + keyset_results) or 1
+    print(f"\n📈 {title}  (■ OFFSET / □ キーセット, 最大 {peak:.1f}ms)")
+    for offset_row, keyset_row in zip(offset_results, keyset_results):
+        page, depth, offset_ms, offset_rows = offset_row
+        _, _, keyset_ms, keyset_rows = keyset_row
+        if (page - 1) % every and page != len(offset_results):
+            continue
+        print(
+            f"   {depth:>6,}行目 ■{'■' * int(offset_ms / peak * BAR_WIDTH):<{BAR_WIDTH}} "
+            f"{offset_ms:7.1f}ms {offset_rows:>9,}行"
+        )
+        print(
+            f"   {'':>9} □{'□' * int(keyset_ms / peak * BAR_WIDTH):<{BAR_WIDTH}} "
+            f"{keyset_ms:7.1f}ms {keyset_rows:>9,}行"
+        )
+
+
+def plot_png(path, curves):
+    """matplotlib があれば PNG にも描画"""
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️ matplotlib が無いため PNG 出力をスキップ")
+        return
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for (query_key, profile, mode), results in curves.items():
+        ax.plot(
+            [r[1] for r in results],
+            [r[2] for r in results],
+            label=f"{query_key} / {profile} / {mode}",
+        )
+    ax.set_xlabel("offset (rows)")
+    ax.set_ylabel("latency (ms)")
+    ax.legend(fontsize="small")
+    fig.savefig(path)
+    print(f"🖼️ グラフを出力: {path}")
+
+
+def write_csv(path, curves):
+    """ページごとの計測結果を CSV に出力"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["query", "profile", "mode", "page", "offset", "latency_ms", "rows_examined"]
+        )
+        for (query_key, profile, mode), results in curves.items():
+            for page, depth, latency, examined in results:
+                writer.writerow(
+                    [query_key, profile, mode, page, depth, f"{latency:.3f}", examined]
+                )
+    print(f"📄 CSV を出力: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OFFSET vs キーセット ページングベンチマーク")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=INDEX_PROFILES,
+        default=["none", "single", "composite"],
+        help="比較するインデックスプロファイル",
+    )
+    parser.add_argument("--every", type=int, default=10, help="グラフに表示するページ間隔")
+    parser.add_argument("--csv", help="ページごとの結果を書き出す CSV ファイル")
+    parser.add_argument("--png", help="matplotlib でグラフを書き出す PNG ファイル")
+    args = parser.parse_args()
+
+    print("📚 深いページングベンチマーク")
+    print("=" * 60)
+
+    conn = None
+    cursor = None
+    curves = {}
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        for profile in args.profiles:
+            print(f"\n🔧 インデックスプロファイル: {profile}")
+            drop_all_indexes(cursor)
+            build_index_profile(cursor, INDEX_PROFILES[profile])
+            conn.commit()
+            overhead = status_overhead(cursor)
+
+            for query_key, spec in PAGINATION_QUERIES.items():
+                for mode in ["offset", "keyset"]:
+                    results = walk_pages(cursor, spec, args.page_size, mode, overhead)
+                    curves[(query_key, profile, mode)] = results
+                    total_ms = sum(r[2] for r in results)
+                    total_rows = sum(r[3] for r in results)
+                    print(
+                        f"   {QUERIES[query_key]['name']} [{mode:6}] "
+                        f"{len(results)}ページ 合計 {total_ms:9.1f}ms  検査 {total_rows:>12,}行"
+                    )
+
+                plot_ascii(
+                    f"{QUERIES[query_key]['name']} / {profile}",
+                    curves[(query_key, profile, "offset")],
+                    curves[(query_key, profile, "keyset")],
+                    args.every,
+                )
+
+        if args.csv:
+            write_csv(args.csv, curves)
+        if args.png:
+            plot_png(args.png, curves)
+
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+    finally:
+        if cursor:
+            clear_cursor_safely(cursor)
+            cursor.close()
+        if conn:
+            conn.close()
+
+    print("\n🎉 ページングベンチマーク完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+スキーマクローンによる並列ベンチマーク
+explain_test.orders を explain_test_1..N に複製し、それぞれ別のインデックス
+プロファイルを構築してから、ワーカープールで全クローンに対して同時に QUERIES を実行する。
+リソースグループで各クローンのサーバースレッドを別々の CPU に固定できる
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+from benchmark import QUERIES, ROOT_DB_CONFIG, clear_cursor_safely, run_query_with_timer
+from index_builder import INDEX_PROFILES, build_index_profile, drop_profile_indexes
+from snapshot import docker_exec, export_tables, import_tables
+
+SOURCE_SCHEMA = ROOT_DB_CONFIG["database"]
+CLONE_PREFIX = f"{SOURCE_SCHEMA}_"
+CLONE_TABLES = ["orders"]
+CONTAINER_CLONE_DIR = "/tmp/explain_clone"
+RESOURCE_GROUP_PREFIX = "bench_rg_"
+
+DEFAULT_PROFILES = ["none", "single", "composite", "covering", "optimal"]
+
+
+def connect(schema=None):
+    """管理者権限で接続（クローンスキーマの作成にはルート権限が必要）"""
+    config = dict(ROOT_DB_CONFIG)
+    if schema:
+        config["database"] = schema
+    return mysql.connector.connect(**config)
+
+
+def create_clones(cursor, clones, method):
+    """クローンスキーマを作り orders を複製"""
+    for schema in clones:
+        cursor.execute(f"DROP DATABASE IF EXISTS {schema}")
+        cursor.execute(f"CREATE DATABASE {schema}")
+        for table in CLONE_TABLES:
+            # LIKE は外部キーを複製しないので、別スキーマでも依存関係を持たない
+            cursor.execute(f"CREATE TABLE {schema}.{table} LIKE {SOURCE_SCHEMA}.{table}")
+
+    if method == "tablespace":
+        # 1回エクスポートした .ibd/.cfg を各クローンに IMPORT する
+        export_tables(cursor, SOURCE_SCHEMA, CLONE_TABLES, CONTAINER_CLONE_DIR)
+        try:
+            for schema in clones:
+                import_tables(cursor, schema, CLONE_TABLES, CONTAINER_CLONE_DIR)
+                print(f"  ✅ {schema}: IMPORT TABLESPACE 完了")
+        finally:
+            docker_exec(f"rm -rf {CONTAINER_CLONE_DIR}")
+    else:
+        for schema in clones:
+            for table in CLONE_TABLES:
+                cursor.execute(
+                    f"INSERT INTO {schema}.{table} SELECT * FROM {SOURCE_SCHEMA}.{table}"
+                )
+            cursor.execute("COMMIT")
+            print(f"  ✅ {schema}: INSERT ... SELECT 完了")
+
+
+def setup_resource_groups(cursor, count, cpus):
+    """クローンごとに1つの VCPU に固定したリソースグループを作る"""
+    groups = []
+    for i in range(count):
+        name = f"{RESOURCE_GROUP_PREFIX}{i + 1}"
+        vcpu = cpus[i % len(cpus)]
+        cursor.execute(f"DROP RESOURCE GROUP IF EXISTS {name} FORCE")
+        cursor.execute(f"CREATE RESOURCE GROUP {name} TYPE = USER VCPU = {vcpu}")
+        groups.append(name)
+        print(f"  📌 {name} → VCPU {vcpu}")
+    return groups
+
+
+def drop_resource_groups(cursor, groups):
+    for name in groups:
+        cursor.execute(f"DROP RESOURCE GROUP IF EXISTS {name} FORCE")
+
+
+def build_clone_indexes(schema, profile):
+    """クローン1つにインデックスプロファイルを構築"""
+    conn = connect(schema)
+    cursor = conn.cursor()
+    try:
+        # 元の orders と同じく、外部キー由来のインデックスは残してプロファイル分だけ入れ替える
+        drop_profile_indexes(cursor, INDEX_PROFILES["optimal"])
+        start = time.perf_counter()
+        build_index_profile(cursor, INDEX_PROFILES[profile])
+        return time.perf_counter() - start
+    finally:
+        clear_cursor_safely(cursor)
+        cursor.close()
+        conn.close()
+
+
+def run_clone_suite(schema, profile, resource_group):
+    """クローン1つで QUERIES を順に実行（ワーカースレッド内）"""
+    conn = connect(schema)
+    cursor = conn.cursor()
+    try:
+        if resource_group:
+            cursor.execute(f"SET RESOURCE GROUP {resource_group}")
+            clear_cursor_safely(cursor)
+
+        start = time.perf_counter()
+        results = {
+            query_key: run_query_with_timer(cursor, query_info["sql"])
+            for query_key, query_info in QUERIES.items()
+        }
+        return profile, results, time.perf_counter() - start
+    finally:
+        clear_cursor_safely(cursor)
+        cursor.close()
+        conn.close()
+
+
+def show_report(outcomes, wall_time, serial_outcomes=None):
+    """クエリ × プロファイルの実行時間表"""
+    print("\n" + "⚡" * 30)
+    print("📊 並列ベンチマークレポート")
+    print("⚡" * 30)
+
+    profiles = [profile for profile, _, _ in outcomes]
+    header = "".join(f"{profile:>12}" for profile in profiles)
+    print(f"\n{'':28}{header}")
+    for query_key, query_info in QUERIES.items():
+        cells = ""
+        for _, results, _ in outcomes:
+            elapsed = results[query_key]["execution_time"]
+            cells += f"{elapsed:11.3f}s" if elapsed is not None else f"{'失敗':>11}"
+        print(f"{query_info['name']:28}{cells}")
+
+    # 各クローンの時間は CPU・I/O を奪い合いながら測ったものなので直列実行の時間ではない
+    concurrent_sum = sum(elapsed for _, _, elapsed in outcomes)
+    print(
+        f"\n⏱️  各クローンの所要時間の合計（同時実行中）: {concurrent_sum:.2f}秒 / "
+        f"実時間: {wall_time:.2f}秒"
+    )
+    if serial_outcomes:
+        serial_time = sum(elapsed for _, _, elapsed in serial_outcomes)
+        print(f"⏱️  直列実行（同時 1 クローン）: {serial_time:.2f}秒", end="")
+        if wall_time > 0:
+            print(f" → 並列化で {serial_time / wall_time:.1f}倍")
+        else:
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スキーマクローンによる並列ベンチマーク")
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=INDEX_PROFILES,
+        default=DEFAULT_PROFILES,
+        help="クローンごとに構築するインデックスプロファイル（クローン数 = 個数）",
+    )
+    parser.add_argument(
+        "--clone-method",
+        choices=["tablespace", "insert"],
+        default="tablespace",
+        help="トランスポータブル表領域で複製するか INSERT ... SELECT で複製するか",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=max(1, min(len(DEFAULT_PROFILES), (os.cpu_count() or 2) // 2)),
+        help="同時に実行するクローン数の上限",
+    )
+    parser.add_argument(
+        "--pin",
+        action="store_true",
+        help="リソースグループで各クローンのサーバースレッドを別々の VCPU に固定",
+    )
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        nargs="+",
+        default=None,
+        help="--pin で使う VCPU 番号（省略時は 0..cpu_count-1）",
+    )
+    parser.add_argument(
+        "--serial",
+        action="store_true",
+        help="並列実行の後に同時 1 クローンで一巡し、直列実行の基準時間を測る",
+    )
+    parser.add_argument("--keep", action="store_true", help="実行後もクローンを残す")
+    args = parser.parse_args()
+
+    clones = [f"{CLONE_PREFIX}{i + 1}" for i in range(len(args.profiles))]
+    assignments = list(zip(clones, args.profiles))
+
+    print("⚡ 並列ベンチマーク")
+    print("=" * 60)
+    for schema, profile in assignments:
+        print(f"  🧬 {schema}: {profile}")
+
+    conn = None
+    cursor = None
+    groups = []
+
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+
+        print(f"\n🧬 クローン作成 ({args.clone_method})...")
+        start = time.perf_counter()
+        create_clones(cursor, clones, args.clone_method)
+        print(f"  🏁 クローン作成: {time.perf_counter() - start:.2f}秒")
+
+        print("\n🏗️ インデックス構築（並列）...")
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            build_times = list(
+                pool.map(lambda item: build_clone_indexes(*item), assignments)
+            )
+        for (schema, profile), elapsed in zip(assignments, build_times):
+            print(f"  ✅ {schema} ({profile}): {elapsed:.2f}秒")
+
+        if args.pin:
+            cpus = args.cpus or list(range(os.cpu_count() or 1))
+            try:
+                groups = setup_resource_groups(cursor, len(clones), cpus)
+            except mysql.connector.Error as e:
+                print(f"  ⚠️ リソースグループ作成失敗（固定なしで続行）: {e}")
+                groups = []
+
+        print(f"\n🚀 クエリ実行（同時 {args.concurrency} クローン）...")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(
+                    run_clone_suite,
+                    schema,
+                    profile,
+                    groups[i] if groups else None,
+                )
+                for i, (schema, profile) in enumerate(assignments)
+            ]
+            outcomes = [future.result() for future in futures]
+        wall_time = time.perf_counter() - start
+
+        serial_outcomes = None
+        if args.serial:
+            # 並列実行の後に測るのでキャッシュが温まっており、倍率は控えめに出る
+            print("\n🐢 直列基準（同時 1 クローン）...")
+            serial_outcomes = [
+                run_clone_suite(schema, profile, groups[i] if groups else None)
+                for i, (schema, profile) in enumerate(assignments)
+            ]
+
+        show_report(outcomes, wall_time, serial_outcomes)
+
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+    finally:
+        if cursor:
+            drop_resource_groups(cursor, groups)
+            if not args.keep:
+                for schema in clones:
+                    cursor.execute(f"DROP DATABASE IF EXISTS {schema}")
+                print("\n🗑️ クローンを削除")
+            clear_cursor_safely(cursor)
+            cursor.close()
+        if conn:
+            conn.close()
+
+    print("\n🎉 並列ベンチマーク完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+orders の order_date による RANGE パーティショニング実験
+orders を月/四半期単位でパーティション分割したコピーを作り、
+パーティションあり/なし × インデックスあり/なしで QUERIES を比較する
+"""
+
+import argparse
+import re
+from datetime import date
+
+import mysql.connector
+
+from benchmark import (
+    DB_CONFIG,
+    OPTIMAL_INDEXES,
+    QUERIES,
+    clear_cursor_safely,
+    drop_all_indexes,
+    run_query_with_timer,
+)
+from index_builder import build_index_profile, drop_profile_indexes
+
+PARTITIONED_TABLE = "orders_partitioned"
+
+# パーティションテーブルには外部キーを張れない（InnoDB の制約）ため FOREIGN KEY は省く。
+# また、すべての一意キーにパーティションキーを含める必要があるので主キーに order_date を加える。
+PARTITIONED_DDL = """
+CREATE TABLE {table} (
+    order_id INT NOT NULL AUTO_INCREMENT,
+    customer_id INT NOT NULL,
+    product_id INT NOT NULL,
+    order_date DATE NOT NULL,
+    quantity INT NOT NULL DEFAULT 1,
+    unit_price DECIMAL(10,2) NOT NULL,
+    total_amount DECIMAL(12,2) NOT NULL,
+    status ENUM('pending', 'processing', 'shipped', 'delivered', 'cancelled') NOT NULL DEFAULT 'pending',
+    shipping_country VARCHAR(50) NOT NULL,
+    shipping_city VARCHAR(100) NOT NULL,
+    payment_method ENUM('credit_card', 'debit_card', 'bank_transfer', 'paypal', 'cash') NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (order_id, order_date),
+    -- 元テーブルで外部キー用に作られるインデックス相当を残して条件を揃える
+    KEY idx_customer_id (customer_id),
+    KEY idx_product_id (product_id)
+) ENGINE=InnoDB
+{partition_clause}
+"""
+
+COPY_BATCH_ROWS = 500000
+
+
+def period_boundaries(min_date, max_date, granularity):
+    """min_date を含む期間の開始から max_date の次の期間までの境界日"""
+    step = 1 if granularity == "month" else 3
+    month = ((min_date.month - 1) // step) * step + 1
+    current = date(min_date.year, month, 1)
+
+    boundaries = []
+    while current <= max_date:
+        month_index = current.year * 12 + (current.month - 1) + step
+        current = date(month_index // 12, month_index % 12 + 1, 1)
+        boundaries.append(current)
+    return boundaries
+
+
+def partition_name(upper_bound, granularity):
+    """境界（排他的上限）からパーティション名を作る"""
+    month_index = upper_bound.year * 12 + (upper_bound.month - 1) - 1
+    year, month = divmod(month_index, 12)
+    if granularity == "month":
+        return f"p{year}{month + 1:02d}"
+    return f"p{year}q{month // 3 + 1}"
+
+
+def build_partition_clause(boundaries, scheme, granularity):
+    """PARTITION BY 句を組み立てる"""
+    partitions = []
+    for boundary in boundaries:
+        name = partition_name(boundary, granularity)
+        if scheme == "range_columns":
+            partitions.append(f"PARTITION {name} VALUES LESS THAN ('{boundary}')")
+        else:
+            partitions.append(f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{boundary}'))")
+
+    if scheme == "range_columns":
+        partitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+        header = "PARTITION BY RANGE COLUMNS(order_date)"
+    else:
+        partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        header = "PARTITION BY RANGE (TO_DAYS(order_date))"
+
+    return header + " (\n    " + ",\n    ".join(partitions) + "\n)"
+
+
+def create_partitioned_copy(cursor, conn, scheme, granularity):
+    """orders をパーティション分割したコピーを作成"""
+    clear_cursor_safely(cursor)
+    cursor.execute(
+        "SELECT MIN(order_date), MAX(order_date), MIN(order_id), MAX(order_id) FROM orders"
+    )
+    min_date, max_date, min_id, max_id = cursor.fetchone()
+    clear_cursor_safely(cursor)
+
+    boundaries = period_boundaries(min_date, max_date, granularity)
+    clause = build_partition_clause(boundaries, scheme, granularity)
+    print(
+        f"🧱 {PARTITIONED_TABLE} を作成: {scheme} / {granularity} "
+        f"({len(boundaries) + 1}パーティション, {min_date} 〜 {max_date})"
+    )
+
+    cursor.execute(f"DROP TABLE IF EXISTS {PARTITIONED_TABLE}")
+    cursor.execute(PARTITIONED_DDL.format(table=PARTITIONED_TABLE, partition_clause=clause))
+    clear_cursor_safely(cursor)
+
+    # 大規模データでも1トランザクションが肥大化しないよう主キー範囲で分割コピー
+    for start in range(min_id, max_id + 1, COPY_BATCH_ROWS):
+        end = start + COPY_BATCH_ROWS
+        cursor.execute(
+            f"INSERT INTO {PARTITIONED_TABLE} SELECT * FROM orders "
+            "WHERE order_id >= %s AND order_id < %s",
+            (start, end),
+        )
+        conn.commit()
+        print(f"  📊 order_id {min(end - 1, max_id):,} / {max_id:,} までコピー")
+
+    cursor.execute(f"ANALYZE TABLE {PARTITIONED_TABLE}")
+    clear_cursor_safely(cursor)
+
+
+def to_table(sql, table):
+    """クエリ中の orders を対象テーブルに置き換える"""
+    return re.sub(r"\borders\b", table, sql)
+
+
+def table_indexes(table):
+    """OPTIMAL_INDEXES を指定テーブル向けにしたもの"""
+    return [(table, name, columns) for _, name, columns in OPTIMAL_INDEXES]
+
+
+def explain_partitions(cursor, sql):
+    """EXPLAIN の partitions 列（プルーニング後に読むパーティション）"""
+    clear_cursor_safely(cursor)
+    cursor.execute(f"EXPLAIN {sql}")
+    rows = cursor.fetchall()
+    columns = cursor.column_names
+    clear_cursor_safely(cursor)
+
+    index = columns.index("partitions")
+    for row in rows:
+        if row[index]:
+            return row[index].split(",")
+    return []
+
+
+def count_partitions(cursor, table):
+    """テーブルのパーティション数"""
+    clear_cursor_safely(cursor)
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    count = cursor.fetchone()[0]
+    clear_cursor_safely(cursor)
+    return count
+
+
+def prepare_indexes(cursor, conn, table, with_indexes):
+    """対象テーブルのインデックス状態を揃える"""
+    if table == "orders":
+        drop_all_indexes(cursor)
+    else:
+        drop_profile_indexes(cursor, table_indexes(table))
+
+    if with_indexes:
+        print(f"⚡ {table} にインデックス作成...")
+        build_index_profile(cursor, table_indexes(table))
+    conn.commit()
+
+
+def run_configuration(cursor, conn, table, with_indexes):
+    """1つの構成で全クエリを実行"""
+    label = f"{'パーティション' if table != 'orders' else '通常'} / " + (
+        "インデックスあり" if with_indexes else "インデックスなし"
+    )
+    print(f"\n🔧 構成: {label}")
+    prepare_indexes(cursor, conn, table, with_indexes)
+
+    results = {}
+    for query_key, query_info in QUERIES.items():
+        sql = to_table(query_info["sql"], table)
+        result = run_query_with_timer(cursor, sql)
+        result["partitions"] = explain_partitions(cursor, sql) if table != "orders" else []
+        results[query_key] = result
+
+        if result["execution_time"] is None:
+            print(f"   ⚠️ {query_info['name']}: {result['explain_output']}")
+        else:
+            print(f"   {query_info['name']:24} {result['execution_time']:.3f}秒")
+    return label, results
+
+
+def show_report(configurations, total_partitions):
+    """構成ごとの比較レポート"""
+    print("\n" + "🧱" * 30)
+    print("📊 パーティショニング比較レポート")
+    print("🧱" * 30)
+
+    for query_key, query_info in QUERIES.items():
+        print(f"\n{query_info['name']}:")
+        baseline = {}
+        for (table, with_indexes), (label, results) in configurations.items():
+            result = results[query_key]
+            if result["execution_time"] is None:
+                print(f"   {label:28} 失敗")
+                continue
+
+            line = f"   {label:28} {result['execution_time']:8.3f}秒"
+            if result["actual_time_ms"]:
+                line += f"  actual {result['actual_time_ms']:9.1f}ms"
+            if table != "orders":
+                used = len(result["partitions"])
+                line += f"  パーティション {used}/{total_partitions}"
+                base = baseline.get(with_indexes)
+                if base:
+                    line += f"  ({base / result['execution_time']:.1f}倍)"
+            else:
+                baseline[with_indexes] = result["execution_time"]
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="order_date による RANGE パーティショニング実験")
+    parser.add_argument(
+        "--scheme",
+        choices=["range_columns", "range"],
+        default="range_columns",
+        help="RANGE COLUMNS(order_date) か RANGE(TO_DAYS(order_date)) か",
+    )
+    parser.add_argument("--granularity", choices=["month", "quarter"], default="month")
+    parser.add_argument(
+        "--keep", action="store_true", help=f"実験後も {PARTITIONED_TABLE} を残す"
+    )
+    args = parser.parse_args()
+
+    print("🧱 パーティショニング実験")
+    print("=" * 60)
+
+    conn = None
+    cursor = None
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        create_partitioned_copy(cursor, conn, args.scheme, args.granularity)
+        total_partitions = count_partitions(cursor, PARTITIONED_TABLE)
+
+        configurations = {}
+        for table in ["orders", PARTITIONED_TABLE]:
+            for with_indexes in [False, True]:
+                configurations[(table, with_indexes)] = run_configuration(
+                    cursor, conn, table, with_indexes
+                )
+
+        show_report(configurations, total_partitions)
+
+        if not args.keep:
+            cursor.execute(f"DROP TABLE {PARTITIONED_TABLE}")
+            print(f"\n🗑️ {PARTITIONED_TABLE} を削除")
+
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+    finally:
+        if cursor:
+            clear_cursor_safely(cursor)
+            cursor.close()
+        if conn:
+            conn.close()
+
+    print("\n🎉 パーティショニング実験完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+実行計画のフィンガープリントと EXPLAIN ANALYZE 結果のキャッシュ
+クエリ文 + インデックス定義 + 統計情報のバージョンをキーにディスクへ保存し、
+変化がなければ結果を再利用、プランが同じなら通常実行だけで再計測する。
+同じインデックス構成でプランが変わった場合はプランフリップとして報告する
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import mysql.connector
+
+from benchmark import ROOT_DB_CONFIG, clear_cursor_safely, run_query_with_timer
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".plan_cache.json")
+
+# キャッシュファイルの形式が変わったら上げる
+CACHE_FORMAT_VERSION = 1
+
+# コスト・実測値など、プランの形に関係ない部分
+ESTIMATE_PATTERN = re.compile(r"\s*\((?:cost|actual|rows)[^()]*\)")
+QUOTED_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'")
+NUMBER_PATTERN = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+
+
+def normalize_sql(sql):
+    """空白の違いを無視したクエリ文"""
+    return " ".join(sql.split())
+
+
+def normalize_plan(explain_output):
+    """
+    ツリー形式の EXPLAIN 出力から実行時間・コスト・リテラルを取り除く
+
+    各行は "深さ:演算子" の形になり、アクセス方法・テーブル・インデックス名だけが残る
+    """
+    lines = []
+    for line in explain_output.split("\n"):
+        if "->" not in line:
+            continue
+        depth = len(line) - len(line.lstrip(" "))
+        operator = line.strip()[2:].strip()
+        operator = ESTIMATE_PATTERN.sub("", operator)
+        operator = QUOTED_PATTERN.sub("?", operator)
+        operator = NUMBER_PATTERN.sub("?", operator)
+        lines.append(f"{depth // 4}:{operator}")
+    return lines
+
+
+def plan_fingerprint(normalized_plan):
+    return hashlib.sha1("\n".join(normalized_plan).encode("utf-8")).hexdigest()
+
+
+def explain_tree(cursor, sql):
+    """実行せずにツリー形式のプランを取得（EXPLAIN ANALYZE より圧倒的に安い）"""
+    clear_cursor_safely(cursor)
+    cursor.execute(f"EXPLAIN FORMAT=TREE {sql}")
+    output = "\n".join(str(row[0]) for row in cursor.fetchall())
+    clear_cursor_safely(cursor)
+    return output
+
+
+def index_version(cursor):
+    """information_schema.STATISTICS のインデックス定義のハッシュ"""
+    clear_cursor_safely(cursor)
+    cursor.execute(
+        """
+        SELECT TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, EXPRESSION, NON_UNIQUE
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """
+    )
+    rows = cursor.fetchall()
+    clear_cursor_safely(cursor)
+    return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+
+
+def statistics_version(cursor, root_cursor=None):
+    """
+    統計情報のバージョン（mysql.innodb_table_stats の last_update と n_rows のハッシュ）
+
+    testuser には mysql スキーマの参照権限がないので root_cursor で読む。
+    root で接続できなければ information_schema.TABLES をキャッシュなしで読んで代用する
+    """
+    if root_cursor is not None:
+        clear_cursor_safely(root_cursor)
+        root_cursor.execute(
+            """
+            SELECT table_name, last_update, n_rows
+            FROM mysql.innodb_table_stats
+            WHERE database_name = %s
+            ORDER BY table_name
+            """,
+            (ROOT_DB_CONFIG["database"],),
+        )
+        rows = root_cursor.fetchall()
+        clear_cursor_safely(root_cursor)
+    else:
+        clear_cursor_safely(cursor)
+        # 既定では 24 時間キャッシュされた値が返り、データを入れ替えてもキーが変わらない
+        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        cursor.execute(
+            """
+            SELECT TABLE_NAME, UPDATE_TIME, TABLE_ROWS
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME
+            """
+        )
+        rows = cursor.fetchall()
+        clear_cursor_safely(cursor)
+    return hashlib.sha1(repr(rows).encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """EXPLAIN ANALYZE 結果とプランのフィンガープリントのディスクキャッシュ"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        # クエリ + インデックス構成ごとの直近のプラン（フリップ検出用）
+        self.latest = {}
+        self.flips = []
+        self._root_conn = None
+        self._root_cursor = None
+
+        try:
+            # autocommit でないと最初の SELECT の一貫性スナップショットを読み続けてしまう
+            self._root_conn = mysql.connector.connect(**ROOT_DB_CONFIG, autocommit=True)
+            self._root_cursor = self._root_conn.cursor()
+        except mysql.connector.Error as e:
+            print(f"⚠️ root で接続できないため統計情報は information_schema.TABLES で代用: {e}")
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format_version") == CACHE_FORMAT_VERSION:
+                self.entries = data["entries"]
+                self.latest = data["latest"]
+
+    def close(self):
+        if self._root_cursor:
+            self._root_cursor.close()
+        if self._root_conn:
+            self._root_conn.close()
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format_version": CACHE_FORMAT_VERSION,
+                    "entries": self.entries,
+                    "latest": self.latest,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    def run(self, cursor, sql):
+        """
+        キャッシュを使って run_query_with_timer と同じ形の結果を返す
+
+        result["cache"] は "hit"（再利用）/ "retimed"（プラン不変・通常実行のみ）/ "miss"
+        """
+        text = normalize_sql(sql)
+        indexes = index_version(cursor)
+        stats = statistics_version(cursor, self._root_cursor)
+        key = hashlib.sha1(f"{text}\n{indexes}\n{stats}".encode("utf-8")).hexdigest()
+        plan_key = hashlib.sha1(f"{text}\n{indexes}".encode("utf-8")).hexdigest()
+
+        if key in self.entries:
+            return dict(self.entries[key]["result"], cache="hit")
+
+        plan = normalize_plan(explain_tree(cursor, sql))
+        fingerprint = plan_fingerprint(plan)
+        previous = self.latest.get(plan_key)
+
+        if previous and previous["fingerprint"] == fingerprint:
+            result = dict(previous["result"])
+            result.update(self._time_only(cursor, sql))
+            result["cache"] = "retimed"
+        else:
+            result = run_query_with_timer(cursor, sql)
+            result["cache"] = "miss"
+            if previous:
+                self.flips.append(
+                    {"sql": text, "before": previous["plan"], "after": plan}
+                )
+                result["plan_flip"] = {"before": previous["plan"], "after": plan}
+
+        result["fingerprint"] = fingerprint
+        if result.get("execution_time") is not None:
+            stored = {k: v for k, v in result.items() if k not in ("cache", "plan_flip")}
+            self.entries[key] = {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "result": stored,
+            }
+            self.latest[plan_key] = {
+                "fingerprint": fingerprint,
+                "plan": plan,
+                "result": stored,
+            }
+        return result
+
+    def _time_only(self, cursor, sql):
+        """EXPLAIN ANALYZE を省いて通常実行の時間と行数だけ測る"""
+        clear_cursor_safely(cursor)
+        start = time.time()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        clear_cursor_safely(cursor)
+        return {"execution_time": time.time() - start, "result_rows": len(rows)}
+
+
+def show_plan_flip(flip):
+    """プランフリップの前後を表示"""
+    print("   🔀 プランフリップ検出！（インデックス構成は同じ）")
+    print("      前回:")
+    for line in flip["before"][:5]:
+        print(f"        {line}")
+    print("      今回:")
+    for line in flip["after"][:5]:
+        print(f"        {line}")
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+サーガビリティ（インデックス利用可能性）チェッカー
+QUERIES の WHERE 句を解析し、インデックス対象カラムを関数や演算で包んだ述語を検出する。
+等価な書き換え（日付範囲化・定数の移項）と MySQL 8 の関数インデックスを作り、
+元クエリ・書き換え・関数インデックスの3通りを結果セットのチェックサム付きで比較する
+"""
+
+import argparse
+import hashlib
+import re
+from datetime import date
+from decimal import Decimal, localcontext
+
+import mysql.connector
+
+from benchmark import (
+    DB_CONFIG,
+    OPTIMAL_INDEXES,
+    QUERIES,
+    clear_cursor_safely,
+    drop_all_indexes,
+    run_query_with_timer,
+)
+from index_builder import build_index_profile
+from sql_clauses import ARITHMETIC_PATTERN, DATE_PART_PATTERN, extract_where, split_conjuncts
+
+# インデックスが張られているカラム
+INDEXED_COLUMNS = {
+    column.strip() for _, _, columns in OPTIMAL_INDEXES for column in columns.split(",")
+}
+
+# その他、関数でカラムを包んでいるもの（書き換えはせず検出のみ）
+FUNCTION_CALL_PATTERN = re.compile(r"\b([A-Z_]+)\s*\(\s*(\w+)\s*[,)]", re.IGNORECASE)
+
+FLIPPED = {"=": "=", ">": "<", ">=": "<=", "<": ">", "<=": ">="}
+
+
+def month_after(year, month):
+    """(year, month) の翌月1日"""
+    return date(year + month // 12, month % 12 + 1, 1)
+
+
+def rewrite_date_parts(column, year_predicate, month_predicate):
+    """YEAR(col) / MONTH(col) の条件を col の半開区間に書き換える"""
+    year_op, year = year_predicate
+    if year_op != "=":
+        if month_predicate:
+            return None
+        bound = {
+            ">=": f">= '{date(year, 1, 1)}'",
+            ">": f">= '{date(year + 1, 1, 1)}'",
+            "<": f"< '{date(year, 1, 1)}'",
+            "<=": f"< '{date(year + 1, 1, 1)}'",
+        }[year_op]
+        return [f"{column} {bound}"]
+
+    first, last = 1, 12
+    if month_predicate:
+        month_op, month = month_predicate
+        first, last = {
+            "=": (month, month),
+            ">=": (month, 12),
+            ">": (month + 1, 12),
+            "<=": (1, month),
+            "<": (1, month - 1),
+        }[month_op]
+        if first > last:
+            return None
+
+    return [
+        f"{column} >= '{date(year, first, 1)}'",
+        f"{column} < '{month_after(year, last)}'",
+    ]
+
+
+def rewrite_arithmetic(column, operator, operand, comparison, value):
+    """col op k <cmp> v を col <cmp'> v' に移項する"""
+    operand = Decimal(operand)
+    value = Decimal(value)
+    if operand == 0 and operator in "*/":
+        return None
+
+    with localcontext() as ctx:
+        ctx.prec = 40
+        if operator == "*":
+            bound = value / operand
+        elif operator == "/":
+            bound = value * operand
+        elif operator == "+":
+            bound = value - operand
+        else:
+            bound = value + operand
+        # normalize() も丸めを伴うので 40 桁のコンテキスト内で行う
+        bound = bound.normalize()
+
+    if operator in "*/" and operand < 0:
+        comparison = FLIPPED[comparison]
+    return f"{column} {comparison} {bound:f}"
+
+
+def analyze_where(where):
+    """
+    非サーガブルな述語を検出して書き換えと関数インデックス案を作る
+
+    戻り値: (findings, rewritten_conjuncts, functional_indexes)
+    """
+    conjuncts = split_conjuncts(where)
+    findings = []
+    rewritten = []
+    functional_indexes = []
+    date_parts = {}
+
+    for conjunct in conjuncts:
+        match = DATE_PART_PATTERN.match(conjunct)
+        if match and match.group(2) in INDEXED_COLUMNS:
+            part, column, op, number = match.groups()
+            date_parts.setdefault(column, {})[part.upper()] = (op, int(number), conjunct)
+            continue
+
+        match = ARITHMETIC_PATTERN.match(conjunct)
+        if match and match.group(1) in INDEXED_COLUMNS:
+            column, operator, operand, comparison, value = match.groups()
+            replacement = rewrite_arithmetic(column, operator, operand, comparison, value)
+            findings.append((conjunct, "カラムへの演算", replacement))
+            rewritten.append(replacement or conjunct)
+            index_name = f"idx_fn_{column}_{len(functional_indexes)}"
+            functional_indexes.append((index_name, f"({column} {operator} {operand})"))
+            continue
+
+        wrapped = [
+            (func, column)
+            for func, column in FUNCTION_CALL_PATTERN.findall(conjunct)
+            if column in INDEXED_COLUMNS
+        ]
+        if wrapped:
+            func, column = wrapped[0]
+            findings.append((conjunct, f"{func.upper()}() でカラムを包んでいる", None))
+        rewritten.append(conjunct)
+
+    for column, parts in date_parts.items():
+        year = parts.get("YEAR")
+        month = parts.get("MONTH")
+        originals = [p[2] for p in (year, month) if p]
+        replacement = (
+            rewrite_date_parts(column, year[:2], month[:2] if month else None)
+            if year
+            else None
+        )
+        replacement_text = " AND ".join(replacement) if replacement else None
+        for original in originals:
+            findings.append((original, "日付関数でカラムを包んでいる", replacement_text))
+        rewritten.extend(replacement or originals)
+
+        expressions = [f"({part}({column}))" for part in ("YEAR", "MONTH") if part in parts]
+        functional_indexes.append(
+            (f"idx_fn_{column}_{len(functional_indexes)}", ", ".join(expressions))
+        )
+
+    return findings, rewritten, functional_indexes
+
+
+def rewrite_sql(sql, where, rewritten):
+    """WHERE 句を書き換え後の述語に差し替える"""
+    new_where = "\n          AND ".join(rewritten)
+    return sql.replace(where, new_where, 1)
+
+
+def result_checksum(cursor, sql):
+    """結果セット（返却順）の SHA-256 と行数"""
+    clear_cursor_safely(cursor)
+    cursor.execute(sql)
+    rows = cursor.fetchall()
+    clear_cursor_safely(cursor)
+
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update(repr(row).encode("utf-8"))
+    return digest.hexdigest(), len(rows)
+
+
+def create_functional_indexes(cursor, functional_indexes):
+    """関数インデックス（式をキーにしたインデックス）を作成"""
+    for index_name, expressions in functional_indexes:
+        clear_cursor_safely(cursor)
+        cursor.execute(f"CREATE INDEX {index_name} ON orders ({expressions})")
+        clear_cursor_safely(cursor)
+        print(f"    ✅ 関数インデックス作成: {index_name} ({expressions})")
+
+
+def drop_functional_indexes(cursor, functional_indexes):
+    """関数インデックスを削除"""
+    for index_name, _ in functional_indexes:
+        clear_cursor_safely(cursor)
+        cursor.execute(f"DROP INDEX {index_name} ON orders")
+        clear_cursor_safely(cursor)
+
+
+def run_variant(cursor, label, sql):
+    """1つのバリエーションを計測してチェックサムを取る"""
+    result = run_query_with_timer(cursor, sql)
+    result["checksum"], result["rows"] = result_checksum(cursor, sql)
+    result["label"] = label
+
+    if result["execution_time"] is None:
+        print(f"   ⚠️ {label}: {result['explain_output']}")
+        return result
+
+    print(f"   {label:14} {result['execution_time']:8.3f}秒  {result['rows']:>6,}行")
+    if result["actual_time_ms"]:
+        print(f"   {'':14} actual time: {result['actual_time_ms']:.1f}ms")
+    lines = result["explain_output"].split("\n")[:2]
+    for line in lines:
+        print(f"   {'':14} {line.strip()[:110]}")
+    return result
+
+
+def show_comparison(variants):
+    """3通りの実行時間と結果の一致を表示"""
+    original = variants[0]
+    print("\n   📊 比較:")
+    for variant in variants:
+        same = variant["checksum"] == original["checksum"]
+        mark = "✅ 一致" if same else "❌ 不一致"
+        speedup = ""
+        if original["execution_time"] and variant["execution_time"]:
+            speedup = f"{original['execution_time'] / variant['execution_time']:.1f}倍"
+        print(
+            f"   {variant['label']:14} {speedup:>8}  {mark}  sha256={variant['checksum'][:16]}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="サーガビリティチェックと書き換え比較")
+    parser.add_argument(
+        "--analyze-only", action="store_true", help="検出と書き換え案の表示だけ行う"
+    )
+    parser.add_argument(
+        "--keep-functional-indexes", action="store_true", help="関数インデックスを残す"
+    )
+    args = parser.parse_args()
+
+    print("🔎 サーガビリティチェッカー")
+    print("=" * 60)
+
+    analyses = {}
+    for query_key, query_info in QUERIES.items():
+        where = extract_where(query_info["sql"])
+        if not where:
+            continue
+        findings, rewritten, functional_indexes = analyze_where(where)
+
+        print(f"\n{query_info['name']}:")
+        if not findings:
+            print("   ✅ すべての述語がサーガブル")
+            continue
+
+        for original, reason, replacement in findings:
+            print(f"   💩 {original}  ← {reason}")
+            if replacement:
+                print(f"      ➡️  {replacement}")
+            else:
+                print("      ⚠️  等価な範囲条件に書き換えられません")
+        for index_name, expressions in functional_indexes:
+            print(f"   🧩 関数インデックス案: {index_name} ({expressions})")
+
+        analyses[query_key] = (where, rewritten, functional_indexes)
+
+    if args.analyze_only or not analyses:
+        return
+
+    conn = None
+    cursor = None
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        print("\n⚡ 比較用に通常インデックスを揃える...")
+        drop_all_indexes(cursor)
+        build_index_profile(cursor, OPTIMAL_INDEXES)
+        conn.commit()
+
+        for query_key, (where, rewritten, functional_indexes) in analyses.items():
+            sql = QUERIES[query_key]["sql"]
+            rewritten_sql = rewrite_sql(sql, where, rewritten)
+
+            print(f"\n{QUERIES[query_key]['name']}:")
+            print("-" * 40)
+            variants = [
+                run_variant(cursor, "元クエリ", sql),
+                run_variant(cursor, "書き換え", rewritten_sql),
+            ]
+
+            create_functional_indexes(cursor, functional_indexes)
+            try:
+                variants.append(run_variant(cursor, "関数インデックス", sql))
+            finally:
+                if not args.keep_functional_indexes:
+                    drop_functional_indexes(cursor, functional_indexes)
+
+            show_comparison(variants)
+
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+    finally:
+        if cursor:
+            clear_cursor_safely(cursor)
+            cursor.close()
+        if conn:
+            conn.close()
+
+    print("\n🎉 サーガビリティチェック完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+サンプリングによる選択率・カーディナリティ推定とインデックス候補ランキング
+主キー範囲サンプリングで orders を安く読み、HyperLogLog と top-k で
+カラム（およびカラムペア）の分布を推定し、DDL を実行する前に
+QUERIES の各述語に対する候補インデックスの検査行数を見積もる
+"""
+
+import argparse
+import hashlib
+import math
+import random
+import re
+from datetime import date
+from decimal import Decimal
+
+import mysql.connector
+
+from benchmark import DB_CONFIG, OPTIMAL_INDEXES, QUERIES, clear_cursor_safely
+from sql_clauses import (
+    ARITHMETIC_PATTERN,
+    DATE_PART_PATTERN,
+    extract_limit,
+    extract_order_by,
+    extract_select,
+    extract_where,
+    has_group_by,
+    split_conjuncts,
+    split_top_level,
+)
+
+PROFILE_COLUMNS = [
+    "order_id",
+    "customer_id",
+    "product_id",
+    "order_date",
+    "quantity",
+    "total_amount",
+    "status",
+    "shipping_country",
+    "shipping_city",
+    "payment_method",
+]
+
+
+def months_ago(months, today=None):
+    """DATE_SUB(CURDATE(), INTERVAL n MONTH) と同じ日付（月末は丸める）"""
+    today = today or date.today()
+    month_index = today.year * 12 + (today.month - 1) - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    for day in range(today.day, 0, -1):
+        try:
+            return date(year, month, day)
+        except ValueError:
+            continue
+
+
+COMPARISON_PATTERN = re.compile(r"^(\w+)\s*(>=|<=|=|>|<)\s*(.+)$")
+BETWEEN_PATTERN = re.compile(r"^(\w+)\s+BETWEEN\s+(.+?)\s+AND\s+(.+)$", re.IGNORECASE)
+IN_PATTERN = re.compile(r"^(\w+)\s+IN\s*\((.*)\)$", re.IGNORECASE)
+MONTHS_AGO_PATTERN = re.compile(
+    r"^DATE_SUB\(\s*CURDATE\(\)\s*,\s*INTERVAL\s+(\d+)\s+MONTH\s*\)$", re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(r"^-?\d+(?:\.\d+)?$")
+
+ARITHMETIC = {
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+}
+
+
+def parse_literal(text):
+    """述語の右辺（数値・文字列・CURDATE() 系の日付）を Python の値にする"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == "'":
+        return text[1:-1]
+    if NUMBER_PATTERN.match(text):
+        return Decimal(text)
+    if text.upper() == "CURDATE()":
+        return date.today()
+    match = MONTHS_AGO_PATTERN.match(text)
+    if match:
+        return months_ago(int(match.group(1)))
+    raise ValueError(f"解釈できない値: {text}")
+
+
+def profile_column(column, conjunct):
+    if column not in PROFILE_COLUMNS:
+        raise ValueError(f"サンプル対象外のカラム {column}: {conjunct}")
+    return column
+
+
+def date_part_predicate(part, op, number):
+    return lambda d: matches(getattr(d, part.lower()), op, int(number))
+
+
+def arithmetic_predicate(operator, operand, comparison, value):
+    return lambda a: matches(
+        ARITHMETIC[operator](a, Decimal(operand)), comparison, Decimal(value)
+    )
+
+
+def parse_conjunct(conjunct):
+    """
+    述語1つを (カラム, 演算子, 値) にする
+
+    "func" はカラムを関数や演算で包んだ（インデックスで使えない）述語で、値は判定関数
+    """
+    match = DATE_PART_PATTERN.match(conjunct)
+    if match:
+        part, column, op, number = match.groups()
+        return (profile_column(column, conjunct), "func", date_part_predicate(part, op, number))
+
+    match = ARITHMETIC_PATTERN.match(conjunct)
+    if match:
+        column, operator, operand, comparison, value = match.groups()
+        return (
+            profile_column(column, conjunct),
+            "func",
+            arithmetic_predicate(operator, operand, comparison, value),
+        )
+
+    match = BETWEEN_PATTERN.match(conjunct)
+    if match:
+        column, low, high = match.groups()
+        return (
+            profile_column(column, conjunct),
+            "between",
+            (parse_literal(low), parse_literal(high)),
+        )
+
+    match = IN_PATTERN.match(conjunct)
+    if match:
+        column, values = match.groups()
+        return (
+            profile_column(column, conjunct),
+            "in",
+            tuple(parse_literal(v) for v in split_top_level(values)),
+        )
+
+    match = COMPARISON_PATTERN.match(conjunct)
+    if match:
+        column, op, value = match.groups()
+        return (profile_column(column, conjunct), op, parse_literal(value))
+
+    raise ValueError(f"解釈できない述語: {conjunct}")
+
+
+def query_predicates(sql):
+    """QUERIES の SQL から SELECT / WHERE / ORDER BY / LIMIT の構造を取り出す"""
+    select = extract_select(sql)
+    if select != ["*"]:
+        columns = []
+        for expression in select:
+            for word in re.findall(r"\w+", expression):
+                if word in PROFILE_COLUMNS and word not in columns:
+                    columns.append(word)
+        select = columns
+    else:
+        select = "*"
+
+    where = extract_where(sql)
+    predicates = [parse_conjunct(c) for c in split_conjuncts(where)] if where else []
+
+    if has_group_by(sql):
+        # GROUP BY のため一致行はすべて読む必要がある
+        order_by, limit = [], None
+    else:
+        order_by = []
+        for expression, _ in extract_order_by(sql):
+            order_by.append(profile_column(expression, sql.strip()))
+        limit = extract_limit(sql)
+
+    return {"select": select, "where": predicates, "order_by": order_by, "limit": limit}
+
+
+def build_query_predicates():
+    """QUERIES の全クエリを構造化（解釈できない SQL があれば ValueError）"""
+    specs = {}
+    for query_key, query_info in QUERIES.items():
+        try:
+            specs[query_key] = query_predicates(query_info["sql"])
+        except ValueError as e:
+            raise ValueError(f"{query_key}: {e}") from e
+    return specs
+
+
+# 非カバリングのインデックスでこれ以上の割合を読むならフルスキャンの方が安い目安
+FULL_SCAN_THRESHOLD = 0.25
+
+
+class HyperLogLog:
+    """HyperLogLog によるユニーク数推定（2^p 個のレジスタ）"""
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, value):
+        digest = hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest()
+        x = int.from_bytes(digest, "big")
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        estimate = self.alpha * self.m * self.m / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        # 小さい値域は線形カウンティングで補正
+        if estimate <= 2.5 * self.m and zeros:
+            return self.m * math.log(self.m / zeros)
+        return estimate
+
+
+class SpaceSaving:
+    """Space-Saving アルゴリズムによる頻出値 top-k"""
+
+    def __init__(self, k=20):
+        self.k = k
+        self.counters = {}  # 値 -> [カウント, 過大評価の上限]
+        self.total = 0
+
+    def add(self, value):
+        self.total += 1
+        if value in self.counters:
+            self.counters[value][0] += 1
+        elif len(self.counters) < self.k:
+            self.counters[value] = [1, 0]
+        else:
+            victim = min(self.counters, key=lambda v: self.counters[v][0])
+            count = self.counters.pop(victim)[0]
+            self.counters[value] = [count + 1, count]
+
+    def top(self, n=5, min_frequency=0.001):
+        """保証された頻度（カウント - 誤差）の大きい順。min_frequency 未満の値は除く"""
+        guaranteed = [
+            (value, count - error) for value, (count, error) in self.counters.items()
+        ]
+        ranked = sorted(
+            (item for item in guaranteed if item[1] >= self.total * min_frequency),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        return [(value, count / self.total) for value, count in ranked[:n]]
+
+
+def sample_orders(cursor, blocks, block_rows):
+    """主キーのランダムな開始点から連続ブロックを読むサンプリング"""
+    clear_cursor_safely(cursor)
+    cursor.execute("SELECT MIN(order_id), MAX(order_id) FROM orders")
+    min_id, max_id = cursor.fetchone()
+    clear_cursor_safely(cursor)
+    if min_id is None:
+        return [], 0
+
+    columns = ", ".join(PROFILE_COLUMNS)
+    rows = {}
+    for _ in range(blocks):
+        start = random.randint(min_id, max_id)
+        cursor.execute(
+            f"SELECT {columns} FROM orders WHERE order_id >= %s ORDER BY order_id LIMIT %s",
+            (start, block_rows),
+        )
+        for row in cursor.fetchall():
+            rows[row[0]] = dict(zip(PROFILE_COLUMNS, row))
+        clear_cursor_safely(cursor)
+
+    # AUTO_INCREMENT が詰まっている前提で ID 範囲を行数の推定値とする
+    return list(rows.values()), max_id - min_id + 1
+
+
+def estimate_population_ndv(sample_ndv, sample_size, table_rows):
+    """
+    サンプルのユニーク数から母集団のユニーク数を推定
+
+    値が一様に出現すると仮定し、D * (1 - (1 - 1/D)^n) = d を D について二分法で解く
+    """
+    if sample_ndv >= sample_size * 0.99:
+        # ほぼユニーク（ID など）
+        return table_rows
+
+    def expected_distinct(d):
+        return d * (1 - math.exp(-sample_size / d))
+
+    low, high = sample_ndv, float(table_rows)
+    if expected_distinct(high) <= sample_ndv:
+        return table_rows
+    for _ in range(60):
+        mid = (low + high) / 2
+        if expected_distinct(mid) < sample_ndv:
+            low = mid
+        else:
+            high = mid
+    return high
+
+
+def profile_columns(rows, table_rows, column_pairs):
+    """カラムとカラムペアのユニーク数・頻出値を推定"""
+    sketches = {column: (HyperLogLog(), SpaceSaving()) for column in PROFILE_COLUMNS}
+    pair_sketches = {pair: HyperLogLog() for pair in column_pairs}
+
+    for row in rows:
+        for column, (hll, topk) in sketches.items():
+            hll.add(row[column])
+            topk.add(row[column])
+        for pair, hll in pair_sketches.items():
+            hll.add(tuple(row[column] for column in pair))
+
+    profile = {}
+    for column, (hll, topk) in sketches.items():
+        sample_ndv = hll.count()
+        profile[column] = {
+            "sample_ndv": sample_ndv,
+            "ndv": estimate_population_ndv(sample_ndv, len(rows), table_rows),
+            "top": topk.top(),
+        }
+
+    pair_profile = {}
+    for pair, hll in pair_sketches.items():
+        sample_ndv = hll.count()
+        pair_profile[pair] = estimate_population_ndv(sample_ndv, len(rows), table_rows)
+
+    return profile, pair_profile
+
+
+def matches(value, op, arg):
+    """述語1つを評価"""
+    if op == "=":
+        return value == arg
+    if op == "in":
+        return value in arg
+    if op == ">":
+        return value > arg
+    if op == ">=":
+        return value >= arg
+    if op == "<":
+        return value < arg
+    if op == "<=":
+        return value <= arg
+    if op == "between":
+        return arg[0] <= value <= arg[1]
+    if op == "func":
+        return arg(value)
+    raise ValueError(f"unknown operator: {op}")
+
+
+def selectivity(rows, predicates):
+    """サンプル上で述語すべてを満たす割合"""
+    if not predicates:
+        return 1.0
+    hits = sum(
+        1 for row in rows if all(matches(row[col], op, arg) for col, op, arg in predicates)
+    )
+    # 0件だと比が発散するので、サンプル1行分を下限にする
+    return max(hits, 1) / len(rows)
+
+
+def estimate_index_rows(rows, table_rows, spec, index_columns):
+    """
+    候補インデックスで読む行数を見積もる（使えない場合は None）
+
+    先頭から等値述語が続く限りアクセス条件に使い、最初の範囲述語で止まる。
+    残りのカラムが ORDER BY と一致し LIMIT があれば、その順に読んで打ち切れる。
+    """
+    by_column = {}
+    for predicate in spec["where"]:
+        by_column.setdefault(predicate[0], []).append(predicate)
+
+    access = []
+    eq_prefix = 0
+    ordered_prefix = True
+    for column in index_columns:
+        predicates = [p for p in by_column.get(column, []) if p[1] != "func"]
+        if not predicates:
+            break
+        access.extend(predicates)
+        if all(p[1] == "=" for p in predicates):
+            eq_prefix += 1
+            continue
+        if any(p[1] == "in" for p in predicates):
+            # IN は複数レンジになるので、後続カラムの順序は保証されない
+            ordered_prefix = False
+            continue
+        break
+
+    order_by = spec["order_by"]
+    provides_order = (
+        bool(order_by)
+        and ordered_prefix
+        and index_columns[eq_prefix : eq_prefix + len(order_by)] == order_by
+    )
+
+    if not access and not provides_order:
+        return None
+
+    total_sel = selectivity(rows, spec["where"])
+    access_sel = selectivity(rows, access) if access else 1.0
+    estimate = table_rows * access_sel
+    if provides_order and spec["limit"]:
+        estimate = min(estimate, spec["limit"] * access_sel / total_sel)
+
+    return estimate
+
+
+def is_covering(spec, index_columns):
+    """セカンダリインデックス（+ 主キー）だけで SELECT と WHERE を満たせるか"""
+    if spec["select"] == "*":
+        return False
+    needed = set(spec["select"]) | {p[0] for p in spec["where"]} | set(spec["order_by"])
+    return needed <= set(index_columns) | {"order_id"}
+
+
+def baseline_rows(rows, table_rows, spec):
+    """インデックスなし（主キーのみ）で読む行数"""
+    if spec["order_by"] == ["order_id"] and spec["limit"]:
+        return min(table_rows, spec["limit"] / selectivity(rows, spec["where"]))
+    return table_rows
+
+
+def rank_candidates(rows, table_rows, candidates, query_specs):
+    """クエリごとに候補インデックスを見積もり検査行数の少ない順に並べる"""
+    ranking = {}
+    for query_key, spec in query_specs.items():
+        baseline = baseline_rows(rows, table_rows, spec)
+        estimates = []
+        for table, index_name, columns in candidates:
+            index_columns = [c.strip() for c in columns.split(",")]
+            estimate = estimate_index_rows(rows, table_rows, spec, index_columns)
+            if estimate is None:
+                continue
+            covering = is_covering(spec, index_columns)
+            too_wide = not covering and estimate > table_rows * FULL_SCAN_THRESHOLD
+            estimates.append((index_name, estimate, covering, too_wide))
+
+        estimates.sort(key=lambda item: item[1])
+        ranking[query_key] = (baseline, estimates)
+    return ranking
+
+
+def show_column_profile(profile, pair_profile, sample_size, table_rows):
+    """カラム分布の推定結果を表示"""
+    print(f"\n📋 カラム推定（サンプル {sample_size:,}行 / 推定 {table_rows:,}行）:")
+    for column, info in profile.items():
+        top = ", ".join(f"{value}={freq * 100:.1f}%" for value, freq in info["top"][:3])
+        print(
+            f"   {column:18} NDV≈{info['ndv']:>12,.0f}  "
+            f"等値選択率≈{1 / max(info['ndv'], 1):.2e}  top: {top}"
+        )
+
+    print("\n🔗 カラムペア推定:")
+    for pair, ndv in pair_profile.items():
+        print(f"   ({', '.join(pair)}) NDV≈{ndv:,.0f}")
+
+
+def show_ranking(ranking):
+    """候補インデックスのランキングを表示"""
+    wins = {}
+    for query_key, (baseline, estimates) in ranking.items():
+        print(f"\n{QUERIES[query_key]['name']}:")
+        print(f"   ❌ インデックスなし: 推定 {baseline:,.0f}行")
+        if not estimates:
+            print("   💩 使えるインデックス候補なし（述語がインデックスを使えない形）")
+            continue
+
+        for index_name, estimate, covering, too_wide in estimates[:5]:
+            note = "カバリング" if covering else ""
+            if too_wide:
+                note = "⚠️ フルスキャンの方が安い可能性"
+            ratio = baseline / estimate if estimate else 0
+            print(
+                f"   ✅ {index_name:22} 推定 {estimate:>12,.0f}行  "
+                f"({ratio:6.1f}倍減)  {note}"
+            )
+
+        best_name, best_estimate, _, best_too_wide = estimates[0]
+        if not best_too_wide and best_estimate < baseline:
+            wins.setdefault(best_name, []).append(query_key)
+
+    print("\n🏆 候補インデックス総合ランキング（最良となったクエリ数）:")
+    for table, index_name, columns in OPTIMAL_INDEXES:
+        queries = wins.get(index_name, [])
+        mark = "✅" if queries else "🗑️"
+        print(f"   {mark} {index_name:22} {len(queries)}件  {', '.join(queries)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="選択率・カーディナリティ推定")
+    parser.add_argument("--blocks", type=int, default=200, help="サンプリングするブロック数")
+    parser.add_argument("--block-rows", type=int, default=100, help="1ブロックの行数")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    # QUERIES の SQL から毎回組み立てるので、クエリを書き換えても古い述語で見積もらない
+    try:
+        query_specs = build_query_predicates()
+    except ValueError as e:
+        print(f"💥 QUERIES の述語を解釈できません: {e}")
+        return
+
+    print("🎲 サンプリング選択率プロファイラ")
+    print("=" * 60)
+
+    conn = None
+    cursor = None
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        rows, table_rows = sample_orders(cursor, args.blocks, args.block_rows)
+        if not rows:
+            print("💥 orders が空です")
+            return
+
+        column_pairs = []
+        for _, _, columns in OPTIMAL_INDEXES:
+            index_columns = tuple(c.strip() for c in columns.split(","))
+            if len(index_columns) >= 2 and index_columns[:2] not in column_pairs:
+                column_pairs.append(index_columns[:2])
+
+        profile, pair_profile = profile_columns(rows, table_rows, column_pairs)
+        show_column_profile(profile, pair_profile, len(rows), table_rows)
+        show_ranking(rank_candidates(rows, table_rows, OPTIMAL_INDEXES, query_specs))
+
+    except mysql.connector.Error as e:
+        print(f"💥 データベースエラー: {e}")
+    finally:
+        if cursor:
+            clear_cursor_safely(cursor)
+            cursor.close()
+        if conn:
+            conn.close()
+
+    print("\n🎉 プロファイル完了")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+トランスポータブル表領域によるデータセットのスナップショット保存・復元
+FLUSH TABLES ... FOR EXPORT で .ibd/.cfg を退避し、
+ALTER TABLE ... IMPORT TABLESPACE で数秒で既知の状態へ戻す
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import mysql.connector
+
+from benchmark import ROOT_DB_CONFIG
+
+# 生成対象テーブル（外部キーの親 → 子の順）
+TABLES = ["customers", "products", "orders", "access_logs"]
+
+SCHEMA = ROOT_DB_CONFIG["database"]
+CONTAINER_NAME = "mysql_explain_analyze"
+MYSQL_DATADIR = "/var/lib/mysql"
+
+# compose.yml で ./sql/data を /sql/data にマウントしている前提
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+CONTAINER_SNAPSHOT_DIR = "/sql/data/snapshots"
+
+# manifest.json の形式が変わったら上げる
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def connect_root():
+    """管理者権限でデータベースに接続"""
+    try:
+        return mysql.connector.connect(**ROOT_DB_CONFIG)
+    except mysql.connector.Error as e:
+        print(f"💥 データベース接続エラー: {e}")
+        sys.exit(1)
+
+
+def docker_exec(command):
+    """MySQLコンテナ内でシェルコマンドを実行"""
+    subprocess.run(
+        ["docker", "exec", CONTAINER_NAME, "sh", "-c", command],
+        check=True,
+    )
+
+
+def file_sha256(path):
+    """ファイルのSHA-256を計算（大きな .ibd でもメモリを食わないよう分割読み込み）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def table_checksum(cursor, schema, table):
+    """CHECKSUM TABLE の値を取得"""
+    cursor.execute(f"CHECKSUM TABLE {schema}.{table}")
+    return cursor.fetchone()[1]
+
+
+def export_tables(cursor, schema, tables, container_dest, owner=None):
+    """
+    FLUSH TABLES ... FOR EXPORT でロックしたままコンテナ内で .ibd/.cfg をコピー
+
+    docker exec は root で動くので、ホストから読む場合は owner（"uid:gid"）に持ち主を変える
+    """
+    table_list = ", ".join(f"{schema}.{t}" for t in tables)
+    source_files = " ".join(
+        f"{MYSQL_DATADIR}/{schema}/{t}.ibd {MYSQL_DATADIR}/{schema}/{t}.cfg"
+        for t in tables
+    )
+
+    cursor.execute(f"FLUSH TABLES {table_list} FOR EXPORT")
+    try:
+        command = f"mkdir -p {container_dest} && cp {source_files} {container_dest}/"
+        if owner:
+            command += (
+                f" && chown -R {owner} {container_dest}"
+                f" && chmod u+rwX {container_dest} {container_dest}/*"
+            )
+        docker_exec(command)
+    finally:
+        # .cfg はアンロック時に削除されるので、必ずコピー後に解放する
+        cursor.execute("UNLOCK TABLES")
+
+
+def import_tables(cursor, schema, tables, container_src):
+    """DISCARD → ファイル配置 → IMPORT TABLESPACE の順で表領域を取り込む"""
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    try:
+        for table in tables:
+            cursor.execute(f"ALTER TABLE {schema}.{table} DISCARD TABLESPACE")
+
+        dest = f"{MYSQL_DATADIR}/{schema}"
+        copy_commands = " && ".join(
+            f"cp {container_src}/{t}.ibd {container_src}/{t}.cfg {dest}/"
+            for t in tables
+        )
+        owned_files = " ".join(f"{dest}/{t}.ibd {dest}/{t}.cfg" for t in tables)
+        docker_exec(f"{copy_commands} && chown mysql:mysql {owned_files}")
+
+        for table in tables:
+            cursor.execute(f"ALTER TABLE {schema}.{table} IMPORT TABLESPACE")
+    finally:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    # IMPORT 後に残る .cfg は不要なので片付ける
+    docker_exec("rm -f " + " ".join(f"{MYSQL_DATADIR}/{schema}/{t}.cfg" for t in tables))
+
+
+def load_manifest(name):
+    """スナップショットの manifest.json を読み込む"""
+    path = os.path.join(SNAPSHOT_DIR, name, "manifest.json")
+    if not os.path.exists(path):
+        print(f"💥 スナップショットが見つかりません: {name}")
+        sys.exit(1)
+
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        print(
+            f"💥 非対応のスナップショット形式です: "
+            f"v{manifest.get('format_version')} (対応: v{SNAPSHOT_FORMAT_VERSION})"
+        )
+        sys.exit(1)
+
+    return manifest
+
+
+def list_snapshots():
+    """manifest.json を持つスナップショットを作成日時順に返す"""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+
+    snapshots = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name, "manifest.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+
+    return sorted(snapshots, key=lambda m: m["created_at"])
+
+
+def resolve_name(name):
+    """名前未指定なら最新のスナップショットを使う"""
+    if name:
+        return name
+
+    snapshots = list_snapshots()
+    if not snapshots:
+        print("💥 スナップショットがありません。先に save を実行してください")
+        sys.exit(1)
+    return snapshots[-1]["name"]
+
+
+def save_snapshot(name, with_checksum=True):
+    """現在のテーブルをスナップショットとして保存"""
+    name = name or datetime.now().strftime("%Y%m%d_%H%M%S")
+    host_dir = os.path.join(SNAPSHOT_DIR, name)
+    if os.path.exists(host_dir):
+        print(f"💥 既に存在します: {name}")
+        sys.exit(1)
+
+    print(f"📸 スナップショット保存開始: {name}")
+    conn = connect_root()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT VERSION()")
+        mysql_version = cursor.fetchone()[0]
+
+        tables = {}
+        for table in TABLES:
+            cursor.execute(f"SHOW CREATE TABLE {SCHEMA}.{table}")
+            create_sql = cursor.fetchone()[1]
+            cursor.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{table}")
+            rows = cursor.fetchone()[0]
+            checksum = table_checksum(cursor, SCHEMA, table) if with_checksum else None
+
+            tables[table] = {"create_sql": create_sql, "rows": rows, "checksum": checksum}
+            print(f"  📋 {table:12} {rows:>12,}件")
+
+        # 保存先はホスト側で作り、コピーしたファイルもホストのユーザーの持ち物にする
+        # （root 所有のままだと SHA-256 の計算や manifest.json の書き込みができない）
+        os.makedirs(host_dir)
+        start = datetime.now()
+        export_tables(
+            cursor,
+            SCHEMA,
+            TABLES,
+            f"{CONTAINER_SNAPSHOT_DIR}/{name}",
+            owner=f"{os.getuid()}:{os.getgid()}",
+        )
+        elapsed = (datetime.now() - start).total_seconds()
+        print(f"  ✅ .ibd/.cfg コピー完了 ({elapsed:.1f}秒)")
+
+        for table in TABLES:
+            tables[table]["files"] = {
+                filename: file_sha256(os.path.join(host_dir, filename))
+                for filename in (f"{table}.ibd", f"{table}.cfg")
+            }
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "name": name,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "mysql_version": mysql_version,
+            "schema": SCHEMA,
+            "tables": tables,
+        }
+        with open(os.path.join(host_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        print(f"🎉 スナップショット保存完了: {host_dir}")
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def verify_files(manifest):
+    """スナップショットファイルのSHA-256を manifest と突き合わせる"""
+    host_dir = os.path.join(SNAPSHOT_DIR, manifest["name"])
+    ok = True
+    for table, info in manifest["tables"].items():
+        for filename, expected in info["files"].items():
+            path = os.path.join(host_dir, filename)
+            if not os.path.exists(path) or file_sha256(path) != expected:
+                print(f"  ❌ ファイル不一致: {filename}")
+                ok = False
+    return ok
+
+
+def verify_tables(cursor, manifest):
+    """復元後のテーブルの CHECKSUM TABLE を manifest と突き合わせる"""
+    ok = True
+    for table, info in manifest["tables"].items():
+        if info["checksum"] is None:
+            print(f"  ⚠️  {table}: 保存時のチェックサムなし（スキップ）")
+            continue
+
+        actual = table_checksum(cursor, SCHEMA, table)
+        if actual == info["checksum"]:
+            print(f"  ✅ {table}: チェックサム一致 ({actual})")
+        else:
+            print(f"  ❌ {table}: チェックサム不一致 (期待 {info['checksum']} / 実際 {actual})")
+            ok = False
+    return ok
+
+
+def restore_snapshot(name, verify=False):
+    """スナップショットからテーブルを復元"""
+    name = resolve_name(name)
+    manifest = load_manifest(name)
+    print(f"♻️  スナップショット復元開始: {name}")
+
+    if not verify_files(manifest):
+        print("💥 スナップショットファイルが壊れています。復元を中止します")
+        sys.exit(1)
+
+    conn = connect_root()
+    cursor = conn.cursor()
+
+    try:
+        start = datetime.now()
+
+        # .cfg とテーブル定義が一致しないと IMPORT できないので、保存時の定義で作り直す
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in reversed(TABLES):
+            cursor.execute(f"DROP TABLE IF EXISTS {SCHEMA}.{table}")
+        cursor.execute(f"USE {SCHEMA}")
+        for table in TABLES:
+            cursor.execute(manifest["tables"][table]["create_sql"])
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+        import_tables(cursor, SCHEMA, TABLES, f"{CONTAINER_SNAPSHOT_DIR}/{name}")
+        elapsed = (datetime.now() - start).total_seconds()
+        print(f"  ✅ IMPORT TABLESPACE 完了 ({elapsed:.1f}秒)")
+
+        if verify and not verify_tables(cursor, manifest):
+            print("💥 復元結果が保存時と一致しません")
+            sys.exit(1)
+
+        print(f"🎉 スナップショット復元完了: {name}")
+
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def verify_snapshot(name):
+    """スナップショットファイルと現在のテーブルを検証"""
+    name = resolve_name(name)
+    manifest = load_manifest(name)
+    print(f"🔍 スナップショット検証: {name}")
+
+    files_ok = verify_files(manifest)
+    if files_ok:
+        print("  ✅ ファイルのSHA-256一致")
+
+    conn = connect_root()
+    cursor = conn.cursor()
+    try:
+        tables_ok = verify_tables(cursor, manifest)
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not (files_ok and tables_ok):
+        sys.exit(1)
+
+
+def show_snapshots():
+    """保存済みスナップショットの一覧を表示"""
+    snapshots = list_snapshots()
+    if not snapshots:
+        print("✨ スナップショットなし")
+        return
+
+    print("📸 保存済みスナップショット:")
+    for manifest in snapshots:
+        rows = sum(info["rows"] for info in manifest["tables"].values())
+        print(f"  📋 {manifest['name']:20} {manifest['created_at']}  {rows:>12,}件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="データセットのスナップショット保存・復元")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    save_parser = subparsers.add_parser("save", help="現在のテーブルを保存")
+    save_parser.add_argument("name", nargs="?", help="スナップショット名（省略時は日時）")
+    save_parser.add_argument(
+        "--skip-checksum",
+        action="store_true",
+        help="CHECKSUM TABLE を省略する（大規模データで保存を急ぐ場合）",
+    )
+
+    restore_parser = subparsers.add_parser("restore", help="スナップショットから復元")
+    restore_parser.add_argument("name", nargs="?", help="スナップショット名（省略時は最新）")
+    restore_parser.add_argument(
+        "--verify", action="store_true", help="復元後に CHECKSUM TABLE で検証"
+    )
+
+    verify_parser = subparsers.add_parser("verify", help="スナップショットと現在のテーブルを検証")
+    verify_parser.add_argument("name", nargs="?", help="スナップショット名（省略時は最新）")
+
+    subparsers.add_parser("list", help="保存済みスナップショット一覧")
+
+    args = parser.parse_args()
+
+    if args.command == "save":
+        save_snapshot(args.name, with_checksum=not args.skip_checksum)
+    elif args.command == "restore":
+        restore_snapshot(args.name, verify=args.verify)
+    elif args.command == "verify":
+        verify_snapshot(args.name)
+    elif args.command == "list":
+        show_snapshots()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+QUERIES の SQL 文から句・述語を取り出す簡易パーサ
+sargability.py と selectivity_profiler.py で共有する
+"""
+
+import re
+
+CLAUSE_END = r"(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bHAVING\b|\bLIMIT\b|$)"
+SELECT_PATTERN = re.compile(r"\bSELECT\b(.*?)\bFROM\b", re.IGNORECASE | re.DOTALL)
+WHERE_PATTERN = re.compile(r"\bWHERE\b(.*?)" + CLAUSE_END, re.IGNORECASE | re.DOTALL)
+GROUP_BY_PATTERN = re.compile(r"\bGROUP\s+BY\b", re.IGNORECASE)
+ORDER_BY_PATTERN = re.compile(
+    r"\bORDER\s+BY\b(.*?)(?=\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL
+)
+LIMIT_PATTERN = re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE)
+
+# YEAR(col) op N / MONTH(col) op N
+DATE_PART_PATTERN = re.compile(
+    r"^(YEAR|MONTH)\s*\(\s*(\w+)\s*\)\s*(=|>=|<=|>|<)\s*(\d+)$", re.IGNORECASE
+)
+# col op k <cmp> v （op は * / + -）
+ARITHMETIC_PATTERN = re.compile(
+    r"^(\w+)\s*([*/+-])\s*(-?[\d.]+)\s*(=|>=|<=|>|<)\s*(-?[\d.]+)$"
+)
+
+
+def extract_where(sql):
+    """WHERE 句の本体（GROUP BY / ORDER BY / LIMIT の手前まで）"""
+    match = WHERE_PATTERN.search(sql)
+    return match.group(1).strip() if match else None
+
+
+def split_top_level(text, separator=","):
+    """括弧の外にある区切り文字で分割"""
+    parts = []
+    current = []
+    depth = 0
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def extract_select(sql):
+    """SELECT 句の式のリスト"""
+    match = SELECT_PATTERN.search(sql)
+    return split_top_level(" ".join(match.group(1).split())) if match else []
+
+
+def extract_order_by(sql):
+    """ORDER BY の (式, 降順か) のリスト"""
+    match = ORDER_BY_PATTERN.search(sql)
+    if not match:
+        return []
+    items = []
+    for item in split_top_level(" ".join(match.group(1).split())):
+        words = item.rsplit(None, 1)
+        if len(words) == 2 and words[1].upper() in ("ASC", "DESC"):
+            items.append((words[0], words[1].upper() == "DESC"))
+        else:
+            items.append((item, False))
+    return items
+
+
+def extract_limit(sql):
+    match = LIMIT_PATTERN.search(sql)
+    return int(match.group(1)) if match else None
+
+
+def has_group_by(sql):
+    return bool(GROUP_BY_PATTERN.search(sql))
+
+
+def split_conjuncts(where):
+    """トップレベルの AND で分割（括弧内と BETWEEN ... AND ... は分割しない）"""
+    tokens = re.split(r"(\(|\)|\bAND\b|\bBETWEEN\b)", where, flags=re.IGNORECASE)
+    conjuncts = []
+    current = []
+    depth = 0
+    pending_between = False
+
+    for token in tokens:
+        upper = token.upper()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif upper == "BETWEEN" and depth == 0:
+            pending_between = True
+        elif upper == "AND" and depth == 0:
+            if pending_between:
+                pending_between = False
+            else:
+                conjuncts.append(" ".join("".join(current).split()))
+                current = []
+                continue
+        current.append(token)
+
+    conjuncts.append(" ".join("".join(current).split()))
+    return [c for c in conjuncts if c]